@@ -0,0 +1,77 @@
+import hashlib
+import math
+import struct
+
+
+class HyperLogLog:
+    """
+    Approximate distinct counter (HyperLogLog, 2**precision one-byte registers).
+
+    The standard error is about 1.04 / sqrt(2**precision): 1.6% at the default precision
+    of 12. Sketches of the same precision merge by taking the register-wise maximum, so the
+    sketches of several days or products combine into the sketch of their union.
+    to_bytes() stores only the non-zero registers while that is smaller than the full
+    register array, which keeps the sketch of a rarely viewed product to a few bytes.
+    """
+    DENSE = b'D'
+    SPARSE = b'S'
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        # Position of the first 1 bit in the remaining bits
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, other):
+        """Merge another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError('Only sketches of the same precision can be merged')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        used = [(index, register) for index, register in enumerate(self.registers) if register]
+        header = struct.pack('>B', self.precision)
+        if len(used) * 3 < self.size:
+            return self.SPARSE + header + b''.join(struct.pack('>HB', index, register) for index, register in used)
+        return self.DENSE + header + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        """Load a sketch written by to_bytes(); empty data is an empty sketch"""
+        if not data:
+            return cls(precision)
+        data = bytes(data)
+        sketch = cls(data[1])
+        if data[:1] == cls.DENSE:
+            sketch.registers = bytearray(data[2:])
+        else:
+            for index, register in struct.iter_unpack('>HB', data[2:]):
+                sketch.registers[index] = register
+        return sketch
+
+    @classmethod
+    def merged(cls, sketches, precision=12):
+        """One sketch of the union of serialized sketches"""
+        result = cls(precision)
+        for data in sketches:
+            result.update(cls.from_bytes(data, precision))
+        return result
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analytics.models import RollupWatermark
+from analytics.rollups import WATERMARK, roll_up
+
+
+class Command(BaseCommand):
+    help = 'Roll ProductView rows up into the daily product, category and seller view tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookback-days', type=int, default=1,
+                            help='Days before the watermark to rebuild, for views written late')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Forget the watermark and rebuild every day from the first view')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            RollupWatermark.objects.filter(name=WATERMARK).delete()
+        start, watermark, rows = roll_up(options['lookback_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {rows} product/day rows from {start} to {watermark} (watermark is now {watermark})'
+        ))
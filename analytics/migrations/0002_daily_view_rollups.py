@@ -0,0 +1,65 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('products', '0012_product_view_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='category_daily_views_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'day'), name='category_daily_views_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='product_daily_views_day_idx'), models.Index(fields=['seller', 'day'], name='product_daily_views_seller_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='product_daily_views_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='seller_daily_views_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('seller', 'day'), name='seller_daily_views_unique')],
+            },
+        ),
+    ]
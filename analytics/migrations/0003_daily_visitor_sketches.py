@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_daily_view_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productdailyviews',
+            name='visitors',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='sellerdailyviews',
+            name='visitors',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
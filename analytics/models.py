@@ -31,4 +31,76 @@ class UserActivity(models.Model):
     def __str__(self):
         user_identifier = self.user.username if self.user else self.session_id
         return f"{self.activity_type} by {user_identifier} at {self.timestamp}"
-    
\ No newline at end of file
+    
+
+class ProductDailyViews(models.Model):
+    """
+    Product views per product and day, rolled up from ProductView by `manage.py rollup_product_views`.
+    The product's category and seller are copied in so per-seller breakdowns need no join.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    views = models.PositiveIntegerField(default=0)
+    # HyperLogLog sketch of the distinct visitors (users and anonymous visitor ids), see analytics/hyperloglog.py
+    visitors = models.BinaryField(default=b'')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='product_daily_views_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='product_daily_views_day_idx'),
+            models.Index(fields=['seller', 'day'], name='product_daily_views_seller_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.views} views of product {self.product_id} on {self.day}"
+
+
+class CategoryDailyViews(models.Model):
+    """Product views per category and day (the product's own category, not its ancestors)"""
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'day'], name='category_daily_views_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='category_daily_views_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.views} views in category {self.category_id} on {self.day}"
+
+
+class SellerDailyViews(models.Model):
+    """Product views per seller and day"""
+    day = models.DateField()
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    views = models.PositiveIntegerField(default=0)
+    # Union of the seller's product sketches of the day
+    visitors = models.BinaryField(default=b'')
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='seller_daily_views_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='seller_daily_views_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.views} views of seller {self.seller_id}'s products on {self.day}"
+
+
+class RollupWatermark(models.Model):
+    """The first day a rollup hasn't covered yet; days before it are served from the rollup tables"""
+    name = models.CharField(max_length=50, primary_key=True)
+    day = models.DateField()
+    
+    def __str__(self):
+        return f"{self.name} rolled up before {self.day}"
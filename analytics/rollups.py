@@ -0,0 +1,186 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from products.models import Category, Product, ProductView
+from .hyperloglog import HyperLogLog
+from .models import CategoryDailyViews, ProductDailyViews, RollupWatermark, SellerDailyViews
+
+WATERMARK = 'product_views'
+
+# Days aggregated per query when catching up on a long backlog
+ROLLUP_CHUNK_DAYS = 31
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_watermark():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('day', flat=True).first()
+
+
+def aggregate_views(since, until=None, **filters):
+    """Raw ProductView counts per day and product in [since, until), with the product's category and seller"""
+    views = ProductView.objects.filter(timestamp__gte=since, **filters)
+    if until is not None:
+        views = views.filter(timestamp__lt=until)
+    return list(
+        views.annotate(day=TruncDate('timestamp')).order_by()
+        .values('day', 'product_id', category_id=F('product__category_id'), seller_id=F('product__seller_id'))
+        .annotate(views=Count('id'))
+    )
+
+
+def visitor_sketches(since, until=None, **filters):
+    """HyperLogLog sketches of the distinct visitors per (day, product) of raw ProductView rows in [since, until)"""
+    views = ProductView.objects.filter(timestamp__gte=since, **filters)
+    if until is not None:
+        views = views.filter(timestamp__lt=until)
+    sketches = defaultdict(HyperLogLog)
+    visitors = views.annotate(day=TruncDate('timestamp')).order_by().values_list('day', 'product_id', 'user_id', 'session_id').distinct()
+    for day, product_id, user_id, session_id in visitors.iterator():
+        if user_id is not None:
+            sketches[day, product_id].add(f'user:{user_id}')
+        elif session_id:
+            sketches[day, product_id].add(f'visitor:{session_id}')
+    return sketches
+
+
+def roll_up(lookback_days=1, today=None):
+    """
+    Rebuild the daily rollups of every complete day from the watermark up to yesterday and
+    move the watermark to today. The `lookback_days` before the watermark are rebuilt too, to
+    pick up views written after their day was rolled up (buffered or replayed events).
+    Each day is recomputed from scratch, so running it again gives the same result.
+    Returns the first day rebuilt, the new watermark and the number of product/day rows.
+    """
+    today = today or timezone.localdate()
+    watermark = get_watermark()
+    if watermark is None:
+        first_view = ProductView.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        start = timezone.localdate(first_view) if first_view else today
+    else:
+        start = min(watermark, today) - timedelta(days=lookback_days)
+
+    rows = 0
+    chunk_start = start
+    while chunk_start < today:
+        chunk_end = min(chunk_start + timedelta(days=ROLLUP_CHUNK_DAYS), today)
+        rows += _roll_up_days(chunk_start, chunk_end)
+        chunk_start = chunk_end
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'day': today})
+    return start, today, rows
+
+
+@transaction.atomic
+def _roll_up_days(start, end):
+    """Replace the rollups of the days in [start, end)"""
+    rows = aggregate_views(day_start(start), day_start(end))
+    sketches = visitor_sketches(day_start(start), day_start(end))
+    for model in (ProductDailyViews, CategoryDailyViews, SellerDailyViews):
+        model.objects.filter(day__gte=start, day__lt=end).delete()
+
+    categories = Counter()
+    sellers = Counter()
+    seller_sketches = defaultdict(HyperLogLog)
+    for row in rows:
+        categories[row['day'], row['category_id']] += row['views']
+        sellers[row['day'], row['seller_id']] += row['views']
+        sketch = sketches.get((row['day'], row['product_id']))
+        if sketch is not None:
+            seller_sketches[row['day'], row['seller_id']].update(sketch)
+            row['visitors'] = sketch.to_bytes()
+    ProductDailyViews.objects.bulk_create([ProductDailyViews(**row) for row in rows], batch_size=1000)
+    CategoryDailyViews.objects.bulk_create([
+        CategoryDailyViews(day=day, category_id=category_id, views=views)
+        for (day, category_id), views in categories.items()
+    ], batch_size=1000)
+    SellerDailyViews.objects.bulk_create([
+        SellerDailyViews(day=day, seller_id=seller_id, views=views, visitors=seller_sketches[day, seller_id].to_bytes())
+        for (day, seller_id), views in sellers.items()
+    ], batch_size=1000)
+    return len(rows)
+
+
+def _merged_top(rolled, key, live_rows, limit):
+    """
+    The `limit` largest view totals per `key`, from the rollup queryset plus the live rows.
+    Only the rollup's own top `limit` and the keys seen live can make the merged top.
+    """
+    live = Counter()
+    for row in live_rows:
+        live[row[key]] += row['views']
+    totals = Counter(dict(rolled.values_list(key).annotate(total=Sum('views')).order_by('-total', key)[:limit]))
+    missing = set(live) - set(totals)
+    if missing:
+        totals.update(dict(rolled.filter(**{f'{key}__in': missing}).values_list(key).annotate(total=Sum('views')).order_by()))
+    totals.update(live)
+    return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def dashboard_views(days, seller=None, limit=10):
+    """
+    View statistics of the last `days` days, for one seller's products or all of them:
+    days before the watermark come from the rollup tables, the rest (normally just today)
+    is counted from the raw ProductView rows. Unique visitors are merged from the daily
+    HyperLogLog sketches, so they cost no COUNT(DISTINCT) however long the window.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days)
+    rolled_until = max(min(get_watermark() or start, today + timedelta(days=1)), start)
+
+    seller_filter = {'seller': seller} if seller is not None else {}
+    live_filter = {'product__seller': seller} if seller is not None else {}
+    live_rows = aggregate_views(day_start(rolled_until), **live_filter)
+    live_sketches = visitor_sketches(day_start(rolled_until), **live_filter)
+    products = ProductDailyViews.objects.filter(day__gte=start, day__lt=rolled_until, **seller_filter)
+
+    # Views and visitor sketches per day, from the seller rows and today's raw views
+    by_day = Counter()
+    day_visitors = defaultdict(HyperLogLog)
+    seller_days = SellerDailyViews.objects.filter(day__gte=start, day__lt=rolled_until, **seller_filter)
+    for day, views, visitors in seller_days.values_list('day', 'views', 'visitors'):
+        by_day[day] += views
+        day_visitors[day].update(HyperLogLog.from_bytes(visitors))
+    for row in live_rows:
+        by_day[row['day']] += row['views']
+    for (day, product_id), sketch in live_sketches.items():
+        day_visitors[day].update(sketch)
+    total_visitors = HyperLogLog()
+    for sketch in day_visitors.values():
+        total_visitors.update(sketch)
+
+    top_products = _merged_top(products, 'product_id', live_rows, limit)
+    # Sellers' category totals come from their own product rows
+    categories = products if seller is not None else CategoryDailyViews.objects.filter(day__gte=start, day__lt=rolled_until)
+    top_categories = _merged_top(categories, 'category_id', live_rows, limit)
+
+    product_visitors = defaultdict(HyperLogLog)
+    for product_id, visitors in products.filter(product_id__in=[pk for pk, _ in top_products]).values_list('product_id', 'visitors'):
+        product_visitors[product_id].update(HyperLogLog.from_bytes(visitors))
+    for (day, product_id), sketch in live_sketches.items():
+        product_visitors[product_id].update(sketch)
+
+    product_names = dict(Product.objects.filter(pk__in=[pk for pk, _ in top_products]).values_list('id', 'name'))
+    category_names = dict(Category.objects.filter(pk__in=[pk for pk, _ in top_categories]).values_list('id', 'name'))
+    return {
+        # Unique visitor counts are HyperLogLog estimates (about 1.6% standard error)
+        'unique_visitors': total_visitors.count(),
+        'views_by_day': [
+            {'day': day, 'count': count, 'unique_visitors': day_visitors[day].count()}
+            for day, count in sorted(by_day.items())
+        ],
+        'top_products': [
+            {'id': pk, 'name': product_names[pk], 'view_count': views, 'unique_visitors': product_visitors[pk].count()}
+            for pk, views in top_products if pk in product_names
+        ],
+        'top_viewed_categories': [
+            {'id': pk, 'name': category_names[pk], 'views': views}
+            for pk, views in top_categories if pk in category_names
+        ],
+    }
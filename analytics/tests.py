@@ -1,3 +1,140 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from caching import tiered_cache
+from products.models import Category, Product, ProductView
+from .hyperloglog import HyperLogLog
+from .models import CategoryDailyViews, ProductDailyViews, SellerDailyViews
+
+User = get_user_model()
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        other_seller = User.objects.create_user('other', 'other@test.com', 'password123', role='seller')
+        self.client.force_authenticate(user=self.seller)
+        self.books = Category.objects.create(name='Books')
+        games = Category.objects.create(name='Games')
+        for category, seller, count in [(self.books, self.seller, 2), (games, self.seller, 1), (self.books, other_seller, 3)]:
+            for i in range(count):
+                Product.objects.create(name=f'{category.name} {i}', description='Description', price='5.00', stock=1, category=category, seller=seller)
+
+    @override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+    def test_category_stats_come_from_the_query_cache_until_products_change(self):
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(
+            [(category['name'], category['product_count']) for category in response.data['top_categories']],
+            [('Books', 2), ('Games', 1)]
+        )
+        
+        # Only the view statistics are queried again: the watermark, today's raw views and visitors,
+        # and the rollups for views per day, top products and top categories
+        with self.assertNumQueries(6):
+            self.client.get('/api/analytics/dashboard/')
+        
+        Product.objects.create(name='Books 9', description='Description', price='5.00', stock=1, category=self.books, seller=self.seller)
+        response = self.client.get('/api/analytics/dashboard/')
+        self.assertEqual(response.data['top_categories'][0]['product_count'], 3)
+
+    def test_dashboard_is_computed_once_per_scope(self):
+        first = self.client.get('/api/analytics/dashboard/', {'days': 7})
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/analytics/dashboard/', {'days': 7})
+        self.assertEqual(second.data, first.data)
+        
+        # Another seller gets their own dashboard
+        other = User.objects.get(username='other')
+        self.client.force_authenticate(user=other)
+        response = self.client.get('/api/analytics/dashboard/', {'days': 7})
+        self.assertEqual([category['name'] for category in response.data['top_categories']], ['Books'])
+
+
+@override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        # Dashboards cached by other tests would be served for reused user ids
+        tiered_cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        other_seller = User.objects.create_user('other', 'other@test.com', 'password123', role='seller')
+        self.client.force_authenticate(user=self.seller)
+        books = Category.objects.create(name='Books')
+        self.novel = Product.objects.create(name='Novel', description='d', price='5.00', category=books, seller=self.seller)
+        self.atlas = Product.objects.create(name='Atlas', description='d', price='5.00', category=books, seller=other_seller)
+        now = timezone.now()
+        for product, days_ago, count in [(self.novel, 3, 2), (self.novel, 1, 1), (self.atlas, 1, 5), (self.novel, 0, 1)]:
+            for _ in range(count):
+                ProductView.objects.create(product=product, session_id='s', timestamp=now - timedelta(days=days_ago))
+
+    def test_rollup_is_incremental_and_idempotent(self):
+        out = StringIO()
+        call_command('rollup_product_views', stdout=out)
+        self.assertIn('Rolled up 3 product/day rows', out.getvalue())
+        # Today isn't complete, so it isn't rolled up
+        self.assertEqual(sum(ProductDailyViews.objects.values_list('views', flat=True)), 8)
+        self.assertEqual(sum(CategoryDailyViews.objects.values_list('views', flat=True)), 8)
+        self.assertEqual(SellerDailyViews.objects.get(seller=self.seller, day=timezone.localdate() - timedelta(days=3)).views, 2)
+        
+        call_command('rollup_product_views', stdout=StringIO())
+        call_command('rollup_product_views', lookback_days=5, stdout=StringIO())
+        self.assertEqual(sum(ProductDailyViews.objects.values_list('views', flat=True)), 8)
+
+    def test_dashboard_combines_rollups_with_todays_views(self):
+        before = self.client.get('/api/analytics/dashboard/', {'days': 7}).data
+        call_command('rollup_product_views', stdout=StringIO())
+        after = self.client.get('/api/analytics/dashboard/', {'days': 7}).data
+        self.assertEqual(after['views_by_day'], before['views_by_day'])
+        self.assertEqual([row['count'] for row in after['views_by_day']], [2, 1, 1])
+        self.assertEqual(after['top_products'], [{'id': self.novel.id, 'name': 'Novel', 'view_count': 4, 'unique_visitors': 1}])
+        self.assertEqual(after['unique_visitors'], 1)
+        
+        self.client.force_authenticate(user=User.objects.create_user('admin', 'admin@test.com', 'password123', role='admin'))
+        data = self.client.get('/api/analytics/dashboard/', {'days': 7}).data
+        self.assertEqual([product['name'] for product in data['top_products']], ['Atlas', 'Novel'])
+        self.assertEqual(data['top_viewed_categories'], [{'id': self.novel.category_id, 'name': 'Books', 'views': 9}])
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimates_merge_and_serialize(self):
+        monday, tuesday = HyperLogLog(), HyperLogLog()
+        for i in range(6000):
+            monday.add(f'visitor:{i}')
+        for i in range(4000, 10000):
+            tuesday.add(f'visitor:{i}')
+        self.assertAlmostEqual(monday.count(), 6000, delta=6000 * 0.05)
+        
+        week = HyperLogLog.merged([monday.to_bytes(), tuesday.to_bytes()])
+        self.assertAlmostEqual(week.count(), 10000, delta=10000 * 0.05)
+        self.assertEqual(HyperLogLog.from_bytes(week.to_bytes()).registers, week.registers)
+        
+        # A rarely viewed product's sketch stays small
+        quiet = HyperLogLog()
+        for i in range(3):
+            quiet.add(f'user:{i}')
+        self.assertEqual(quiet.count(), 3)
+        self.assertLess(len(quiet.to_bytes()), 16)
+
+    def test_dashboard_counts_unique_visitors_across_rolled_and_live_days(self):
+        tiered_cache.clear()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        lamp = Product.objects.create(name='Lamp', description='d', price='5.00', category=Category.objects.create(name='Home'), seller=seller)
+        now = timezone.now()
+        for days_ago, visitors in [(2, ['a', 'b']), (1, ['b', 'c']), (0, ['c', 'd'])]:
+            for visitor in visitors:
+                ProductView.objects.create(product=lamp, session_id=visitor, timestamp=now - timedelta(days=days_ago))
+        call_command('rollup_product_views', stdout=StringIO())
+        
+        client = APIClient()
+        client.force_authenticate(user=seller)
+        with override_settings(DASHBOARD_CACHE_TIMEOUT=0):
+            data = client.get('/api/analytics/dashboard/', {'days': 7}).data
+        self.assertEqual(data['unique_visitors'], 4)
+        self.assertEqual([row['unique_visitors'] for row in data['views_by_day']], [2, 2, 2])
+        self.assertEqual(data['top_products'][0]['unique_visitors'], 4)
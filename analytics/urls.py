@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import dashboard_stats
+from .views import dashboard_stats, cache_stats
 
 urlpatterns = [
     path('dashboard/', dashboard_stats, name='dashboard-stats'),
+    path('cache/', cache_stats, name='cache-stats'),
 ]
\ No newline at end of file
@@ -1,12 +1,13 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count
-from products.models import Product, Category, ProductView
-from django.db.models.functions import TruncDay
-from datetime import timedelta
-from django.utils import timezone
-from permissions import IsSellerOrAdmin
+from django.db.models import Count, Q
+from products.models import Product, Category
+from permissions import IsSellerOrAdmin, IsAdmin
+from django.conf import settings
+from caching import get_or_compute, response_cache_stats, tiered_cache
+from products.tracking import view_buffer
+from .rollups import dashboard_views
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsSellerOrAdmin])
@@ -14,74 +15,47 @@ def dashboard_stats(request):
     """Get dashboard statistics for admin and sellers"""
     # Time range
     days = int(request.query_params.get('days', 30))
-    start_date = timezone.now() - timedelta(days=days)
     
-    # Filter by seller if the user is a seller
+    # Admins share one dashboard, sellers get their own. Concurrent requests for the same
+    # one are computed once and the result is reused for DASHBOARD_CACHE_TIMEOUT seconds
     user = request.user
-    seller_filter = {}
-    if user.role == 'seller' and not user.is_staff:
-        seller_filter = {'product__seller': user}
-    
-    # Product views over time
-    views_by_day = ProductView.objects.filter(
-        timestamp__gte=start_date,
-        **seller_filter
-    ).annotate(
-        day=TruncDay('timestamp')
-    ).values('day').annotate(
-        count=Count('id')
-    ).order_by('day')
-    
-    # Top products
-    if user.role == 'seller' and not user.is_staff:
-        # Sellers can only see their own products
-        top_products = Product.objects.filter(
-            seller=user
-        ).annotate(
-            view_count=Count('views')
-        ).order_by('-view_count')[:10].values('id', 'name')
-    else:
-        # Admins can see all products
-        top_products = Product.objects.annotate(
-            view_count=Count('views')
-        ).order_by('-view_count')[:10].values('id', 'name')
+    scope = f'seller:{user.pk}' if user.role == 'seller' and not user.is_staff else 'all'
+    data = get_or_compute(f'dashboard:{scope}:{days}', lambda: _dashboard_data(user, days), settings.DASHBOARD_CACHE_TIMEOUT)
+    return Response(data)
+
+def _dashboard_data(user, days):
+    seller = user if user.role == 'seller' and not user.is_staff else None
     
-    # Add view count to each product
-    for product in top_products:
-        product['view_count'] = ProductView.objects.filter(product_id=product['id']).count()
+    # Views over time, top products and top categories by views: days that are rolled up come
+    # from the daily rollup tables (see analytics/rollups.py), only the rest from ProductView
+    data = dashboard_views(days, seller)
     
-    # Top categories
-    if user.role == 'seller' and not user.is_staff:
-        # Sellers can only see categories of their products
-        seller_product_categories = Product.objects.filter(seller=user).values_list('category', flat=True)
+    # Top categories by product count. Categories and product-to-category mappings rarely
+    # change, so these come from the query cache until the category or product table is written to
+    if seller is not None:
+        # Sellers can only see categories of their products, counting only their products
+        seller_product_categories = list(Product.objects.filter(seller=user).values_list('category', flat=True).cached())
         top_categories = Category.objects.filter(
             id__in=seller_product_categories
         ).annotate(
-            product_count=Count('products')
-        ).order_by('-product_count')[:10].values('id', 'name')
+            product_count=Count('products', filter=Q(products__seller=user))
+        ).order_by('-product_count')[:10].values('id', 'name', 'product_count').cached()
     else:
         # Admins can see all categories
         top_categories = Category.objects.annotate(
             product_count=Count('products')
-        ).order_by('-product_count')[:10].values('id', 'name')
-    
-    # Add product count to each category
-    for category in top_categories:
-        if user.role == 'seller' and not user.is_staff:
-            # For sellers, only count their products
-            category['product_count'] = Product.objects.filter(
-                category_id=category['id'],
-                seller=user
-            ).count()
-        else:
-            # For admins, count all products
-            category['product_count'] = Product.objects.filter(
-                category_id=category['id']
-            ).count()
+        ).order_by('-product_count')[:10].values('id', 'name', 'product_count').cached()
     
+    data['top_categories'] = list(top_categories)
+    return data
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def cache_stats(request):
+    """Hit/miss counts of the response and fragment caches, this worker's memory tier and view buffer"""
     return Response({
-        'views_by_day': list(views_by_day),
-        'top_products': list(top_products),
-        'top_categories': list(top_categories),
+        'endpoints': response_cache_stats(),
+        'local': tiered_cache.local.stats(),
+        'product_views': view_buffer.stats(),
     })
 
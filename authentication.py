@@ -0,0 +1,40 @@
+from django.db.models.functions import MD5, Upper
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that loads the token's user (and so its role) through the
+    table-versioned query cache. Any write to the users table invalidates it, so
+    deactivations, role and password changes take effect on the next request.
+    Only the columns permission checks read are loaded and cached; the password hash and
+    profile fields stay out of the shared cache and load on first access.
+    """
+    auth_fields = ('username', 'is_active', 'is_staff', 'is_superuser', 'role')
+    
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        
+        try:
+            users = self.user_model.objects.only(*self.auth_fields)
+            if api_settings.CHECK_REVOKE_TOKEN:
+                # The token carries get_md5_hash_password(), the upper-case MD5 of the password
+                # hash, so that is all we need to cache
+                users = users.annotate(password_md5=Upper(MD5('password')))
+            user = users.cached().get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+        
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.password_md5:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        
+        return user
@@ -0,0 +1,390 @@
+import hashlib
+import math
+import pickle
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from conditional import not_modified, set_validators
+
+VERSION_KEY = 'version:{}'
+RESPONSE_KEY = 'response:{}:{}:{}'
+STATS_KEY = 'response-cache-stats:{}:{}'
+QUERY_KEY = 'query:{}:{}'
+LOCK_KEY = 'lock:{}'
+TABLE_NAMESPACE = 'table:{}'
+
+# Tables whose writes bump their version; only queries over these tables are cached
+tracked_tables = set()
+TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+[`"]?(\w+)', re.IGNORECASE)
+
+# Names of the cached endpoints, for reporting their statistics
+cached_endpoints = set()
+
+class LocalLRUCache:
+    """
+    Bounded, thread-safe in-process cache: at most `max_entries` keys, each kept for at most
+    `ttl` seconds, least recently used evicted first. Values are stored pickled, like the
+    shared backends do, so callers never share mutable objects across requests.
+    """
+    
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+    
+    def get(self, key):
+        """The cached value, or None when the key is missing or expired"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(entry[1])
+    
+    def set(self, key, value, timeout=None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if timeout is None else min(timeout, self.ttl)
+        entry = (time.monotonic() + ttl, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+    
+    def stats(self):
+        return {'entries': len(self.entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+class TieredCache:
+    """
+    Cache facade with a per-worker LRU in front of the shared backend (CACHES['default']).
+
+    Reads try worker memory first and fill it from the shared cache; writes go to both.
+    Only use it for keys that change when their content does (versioned or content-derived
+    keys): other workers can't see a delete, but they stop asking for a key once the
+    version it embeds has moved on. The version counters themselves always live in the
+    shared cache only.
+    """
+    
+    def __init__(self, shared, local):
+        self.shared = shared
+        self.local = local
+    
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is None:
+                return default
+            self.local.set(key, value)
+        return value
+    
+    def get_many(self, keys):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is None:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote)
+            for key, value in fetched.items():
+                self.local.set(key, value)
+            found.update(fetched)
+        return found
+    
+    def set(self, key, value, timeout=None):
+        self.shared.set(key, value, timeout)
+        self.local.set(key, value, timeout)
+    
+    def set_many(self, mapping, timeout=None):
+        self.shared.set_many(mapping, timeout)
+        for key, value in mapping.items():
+            self.local.set(key, value, timeout)
+    
+    def delete(self, key):
+        self.shared.delete(key)
+        self.local.delete(key)
+    
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
+
+tiered_cache = TieredCache(cache, LocalLRUCache(settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_TTL))
+
+def _initial_version():
+    # Seeded from the clock, so a version key that was evicted can't restart at a value
+    # whose cached entries are still around
+    return time.time_ns() // 1000
+
+def get_versions(namespaces):
+    """Current version of each namespace, in one cache round trip when they all exist"""
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+def bump_table_versions(*models):
+    """Invalidate cached queries over these models' tables, e.g. after raw SQL writes"""
+    bump_version(*(TABLE_NAMESPACE.format(model._meta.db_table) for model in models))
+
+def _bump_sender_table(sender, **kwargs):
+    bump_table_versions(sender)
+
+def track_table_versions(*models):
+    """Version these models' tables on save/delete so .cached() queries over them can be cached"""
+    for model in models:
+        tracked_tables.add(model._meta.db_table)
+        post_save.connect(_bump_sender_table, sender=model, dispatch_uid=f'table-version-save-{model._meta.label}')
+        post_delete.connect(_bump_sender_table, sender=model, dispatch_uid=f'table-version-delete-{model._meta.label}')
+
+class CachedQuerySet(models.QuerySet):
+    """
+    QuerySet with an opt-in result cache for slow-changing tables: `.cached()` results are stored
+    under the SQL, its parameters and the version of every table the SQL reads. Saves, deletes,
+    update() and bulk writes bump those versions, so a cached result is never served after a
+    write. Queries touching a table that isn't tracked (see track_table_versions) always run.
+    Set `volatile_fields` on the model for counters that cached queries never read; updates of
+    only those fields don't invalidate anything.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+    
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+    
+    def cached(self, timeout=None):
+        clone = self._chain()
+        clone._cache_timeout = timeout or settings.QUERY_CACHE_TIMEOUT
+        return clone
+    
+    def _query_cache_key(self):
+        try:
+            sql, params = self.query.get_compiler(using=self.db).as_sql()
+        except EmptyResultSet:
+            return None
+        tables = sorted(set(TABLE_RE.findall(sql)))
+        if not tables or not tracked_tables.issuperset(tables):
+            return None
+        versions = get_versions([TABLE_NAMESPACE.format(table) for table in tables])
+        # The iterable class tells model instances, values() and values_list() results apart
+        query = repr((self.db, self._iterable_class.__name__, sql, params))
+        digest = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+        return QUERY_KEY.format(digest, '.'.join(map(str, versions)))
+    
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_timeout is not None:
+            key = self._query_cache_key()
+            if key is not None:
+                results = tiered_cache.get(key)
+                if results is None:
+                    results = list(self._iterable_class(self))
+                    tiered_cache.set(key, results, self._cache_timeout)
+                self._result_cache = results
+        super()._fetch_all()
+    
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if not set(kwargs) <= set(getattr(self.model, 'volatile_fields', ())):
+            bump_table_versions(self.model)
+        return rows
+    
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        bump_table_versions(self.model)
+        return objs
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Read-through cache with single-flight recomputation and probabilistic early refresh.
+
+    Only one caller (across workers) recomputes a missing key; concurrent callers wait for
+    its result up to SINGLE_FLIGHT_LOCK_TIMEOUT seconds and compute it themselves only if
+    it never appears. Before expiry, each read refreshes the entry early with a probability
+    that rises as expiry nears and with how long `compute` took (the XFetch rule), while
+    the others keep being served the current value. `compute` returning None isn't cached.
+    """
+    entry = tiered_cache.get(key)
+    if entry is not None:
+        value, duration, expires_at = entry
+        # 1 - random() is in (0, 1], so the log is defined and the jitter never negative
+        if time.time() - duration * beta * math.log(1 - random.random()) < expires_at:
+            return value
+    
+    lock_key = LOCK_KEY.format(key)
+    locked = cache.add(lock_key, 1, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            # Someone else is already refreshing it early
+            return entry[0]
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            if cache.get(lock_key) is None:
+                # The computation finished without a cacheable result, or failed
+                break
+    
+    try:
+        started = time.monotonic()
+        value = compute()
+        if value is not None:
+            tiered_cache.set(key, (value, time.monotonic() - started, time.time() + timeout), timeout)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+class FragmentCache:
+    """
+    Cached per-object representations for one response. The hits are fetched with a single
+    get_many up front; misses are rendered through get() as usual and written back with a
+    single set_many by save(). Keys must change whenever the object's representation does.
+    """
+    
+    def __init__(self, name, keys):
+        self.name = f'fragments:{name}'
+        self.keys = keys
+        self.found = tiered_cache.get_many(set(keys.values())) if keys else {}
+        self.missing = {obj_id for obj_id, key in keys.items() if key not in self.found}
+        self.rendered = {}
+    
+    def get(self, obj_id, render):
+        key = self.keys.get(obj_id)
+        if key is None:
+            return render()
+        if key not in self.found:
+            self.found[key] = self.rendered[key] = render()
+        return self.found[key]
+    
+    def save(self):
+        if self.rendered:
+            tiered_cache.set_many(self.rendered, settings.FRAGMENT_CACHE_TIMEOUT)
+        cached_endpoints.add(self.name)
+        _record(self.name, 'hits', len(self.keys) - len(self.missing))
+        _record(self.name, 'misses', len(self.missing))
+
+def bump_version(*namespaces):
+    """Invalidate everything cached under these namespaces by moving their versions on"""
+    _bump(namespaces)
+    # Until the write commits, readers can re-cache the old data under the new version,
+    # so move the versions on once more after the commit
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), None)
+
+def _record(endpoint, outcome, count=1):
+    key = STATS_KEY.format(endpoint, outcome)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        cache.add(key, count, None)
+
+def response_cache_stats():
+    """Hits, misses and hit rate of every cached endpoint and fragment cache"""
+    keys = {(endpoint, outcome): STATS_KEY.format(endpoint, outcome) for endpoint in cached_endpoints for outcome in ('hits', 'misses')}
+    counts = cache.get_many(keys.values())
+    stats = {}
+    for endpoint in sorted(cached_endpoints):
+        hits = counts.get(keys[endpoint, 'hits'], 0)
+        misses = counts.get(keys[endpoint, 'misses'], 0)
+        stats[endpoint] = {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else None}
+    return stats
+
+def response_cache_key(endpoint, namespaces, request):
+    # The host and Accept header shape the body too (absolute image URLs, renderer)
+    variant = '|'.join([request.get_host(), request.META.get('HTTP_ACCEPT', ''), request.get_full_path()])
+    digest = hashlib.md5(variant.encode(), usedforsecurity=False).hexdigest()
+    return RESPONSE_KEY.format(endpoint, '.'.join(map(str, get_versions(namespaces))), digest)
+
+def cache_response(*namespaces, on_hit=None):
+    """
+    Cache the rendered 200 responses of a public GET handler for anonymous requests.
+
+    Entries are keyed by the path, query string and the current version of each namespace
+    the response depends on, so bump_version() invalidates them without deleting keys.
+    `on_hit(view, request, *args, **kwargs)` runs side effects the handler would have had.
+    Cached responses keep their ETag / Last-Modified and still answer conditional requests.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            # Authenticated requests may see user-specific data, so only anonymous ones are cached
+            if request.method != 'GET' or request.user.is_authenticated or not settings.RESPONSE_CACHE_TIMEOUT:
+                return handler(view, request, *args, **kwargs)
+            
+            endpoint = f'{type(view).__name__}.{handler.__name__}'
+            cached_endpoints.add(endpoint)
+            fresh = {}
+            
+            def render():
+                response = fresh['response'] = handler(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return None
+                response = fresh['response'] = view.finalize_response(request, response, *args, **kwargs)
+                response.render()
+                return (response.content, response['Content-Type'], response.get('ETag'), response.get('Last-Modified'))
+            
+            # Concurrent misses for the same key wait for one request to render it
+            cached = get_or_compute(response_cache_key(endpoint, namespaces, request), render, settings.RESPONSE_CACHE_TIMEOUT)
+            if 'response' in fresh:
+                _record(endpoint, 'misses')
+                return fresh['response']
+            
+            _record(endpoint, 'hits')
+            if on_hit is not None:
+                on_hit(view, request, *args, **kwargs)
+            content, content_type, etag, last_modified = cached
+            timestamp = parse_http_date_safe(last_modified) if last_modified else None
+            last_modified = datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp else None
+            return not_modified(request, etag, last_modified) or set_validators(
+                HttpResponse(content, content_type=content_type), etag, last_modified
+            )
+        return wrapper
+    return decorator
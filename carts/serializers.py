@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
 from products.models import Product
-from products.serializers import ProductSerializer
+from products.serializers import ProductSerializer, DynamicFieldsMixin
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
@@ -39,7 +39,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         
         return data
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     item_count = serializers.IntegerField(read_only=True)
@@ -1,3 +1,39 @@
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework import status
+from products.models import Category, Product
+from .models import Cart, CartItem
 
-# Create your tests here.
+User = get_user_model()
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user('customer', 'customer@test.com', 'password123')
+        self.client.force_authenticate(user=self.customer)
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Test Category')
+        cart = Cart.objects.create(customer=self.customer)
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Product {i}', description='Description', price='5.00',
+                stock=10, category=category, seller=seller
+            )
+            CartItem.objects.create(cart=cart, product=product, quantity=2)
+
+    def test_my_cart_sparse_product_details(self):
+        response = self.client.get('/api/cart/my_cart/', {
+            'fields': 'total_amount,items.quantity,items.product_details.name,items.product_details.price'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'total_amount', 'items'})
+        item = response.data['items'][0]
+        self.assertEqual(set(item), {'quantity', 'product_details'})
+        self.assertEqual(set(item['product_details']), {'name', 'price'})
+        self.assertEqual(response.data['total_amount'], '30.00')
+
+    def test_my_cart_query_count_is_independent_of_item_count(self):
+        # Cart lookup, cart items, products, product images
+        with self.assertNumQueries(4):
+            self.client.get('/api/cart/my_cart/', {'fields': 'items.product_details.name,items.product_details.primary_image'})
@@ -2,9 +2,11 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, prefetch_related_objects
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
 from products.models import Product
+from products.serializers import ProductSerializer
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 from permissions import IsCartOwner
@@ -26,12 +28,27 @@ class CartViewSet(viewsets.GenericViewSet):
             return Cart.objects.all()
         return Cart.objects.filter(customer=self.request.user)
     
+    def _cart_response(self, cart):
+        """Serialize the cart, loading its items and only the product data that will be rendered"""
+        product_fields = ProductSerializer.get_selected_fields(self.request, 'items.product_details')
+        prefetch_related_objects([cart], Prefetch(
+            'items',
+            queryset=CartItem.objects.prefetch_related(
+                Prefetch('product', queryset=Product.objects.with_related(product_fields))
+            )
+        ))
+        products = [item.product for item in cart.items.all()]
+        fragments = ProductSerializer.load_fragments(products, self.request, 'items.product_details')
+        serializer = self.get_serializer(cart, context={**self.get_serializer_context(), 'product_fragments': fragments})
+        data = serializer.data
+        fragments.save()
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def my_cart(self, request):
         """Get or create the user's cart"""
         cart, created = Cart.objects.get_or_create(customer=request.user)
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return self._cart_response(cart)
     
     @extend_schema(
         request=OpenApiTypes.OBJECT,
@@ -121,8 +138,7 @@ class CartViewSet(viewsets.GenericViewSet):
             
             # Return updated cart
             cart.refresh_from_db()  # Refresh to ensure we get the latest data
-            serializer = self.get_serializer(cart)
-            return Response(serializer.data)
+            return self._cart_response(cart)
             
         except Exception as e:
             logger.error(f"Error adding item to cart: {str(e)}")
@@ -195,8 +211,7 @@ class CartViewSet(viewsets.GenericViewSet):
             
             # Return updated cart
             cart.refresh_from_db()  # Refresh to ensure we get the latest data
-            serializer = self.get_serializer(cart)
-            return Response(serializer.data)
+            return self._cart_response(cart)
             
         except Exception as e:
             logger.error(f"Error updating cart item: {str(e)}")
@@ -244,8 +259,7 @@ class CartViewSet(viewsets.GenericViewSet):
             
             # Return updated cart
             cart.refresh_from_db()  # Refresh to ensure we get the latest data
-            serializer = self.get_serializer(cart)
-            return Response(serializer.data)
+            return self._cart_response(cart)
             
         except Exception as e:
             logger.error(f"Error removing cart item: {str(e)}")
@@ -261,8 +275,7 @@ class CartViewSet(viewsets.GenericViewSet):
             
             # Return empty cart
             cart.refresh_from_db()  # Refresh to ensure we get the latest data
-            serializer = self.get_serializer(cart)
-            return Response(serializer.data)
+            return self._cart_response(cart)
             
         except Exception as e:
             logger.error(f"Error clearing cart: {str(e)}")
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+def make_etag(*parts, weak=True):
+    """
+    An ETag from the values a representation is built from.
+    Weak by default: equal validators mean the same data, not byte-identical output.
+    """
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def not_modified(request, etag=None, last_modified=None):
+    """
+    A 304 response when If-None-Match / If-Modified-Since show the client's copy is current,
+    otherwise None. Check this before loading and serializing the full representation.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+def page_etag(paginator, queryset, request, view, fields):
+    """
+    ETag for one page of a list: the page's `fields` (ids and update timestamps), fetched
+    through the same paginator so it costs one index-backed query of page size.
+    Lists get no Last-Modified, since removing a row doesn't move the newest timestamp.
+    """
+    # Cursor pagination reads the position from the first ordering column, so the rows include it
+    ordering = [name.lstrip('-') for name in getattr(paginator, 'ordering', ())]
+    lookups = list(dict.fromkeys([*fields, *ordering]))
+    rows = paginator.paginate_queryset(queryset.prefetch_related(None).values(*lookups), request, view=view)
+    return make_etag(request.get_full_path(), [tuple(row.values()) for row in rows])
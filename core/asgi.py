@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Product views are written in batches by a background thread; workers forked after
+# this point (gunicorn --preload) start their own on their first view
+from products.tracking import view_buffer
+view_buffer.start()
+
+# Optional post-start hook: precompute the hot cache entries without delaying startup
+if settings.WARM_CACHES_ON_STARTUP:
+    from products.warmup import start_background_warmup
+    start_background_warmup()
@@ -1,6 +1,17 @@
+from django.conf import settings
+from django.utils import translation
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
 from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from caching import tiered_cache
+
+SCHEMA_CACHE_KEY = 'openapi-schema:{}:{}'
+
+
 class JWTAuthenticationScheme(OpenApiAuthenticationExtension):
     target_class = JWTAuthentication
     name = 'Bearer'
@@ -10,4 +21,34 @@ class JWTAuthenticationScheme(OpenApiAuthenticationExtension):
             'type': 'http',
             'scheme': 'bearer',
             'bearerFormat': 'JWT',
-        }
\ No newline at end of file
+        }
+
+
+class CachedJWTAuthenticationScheme(SimpleJWTScheme):
+    # Extensions match exact classes, so the default authentication class needs its own
+    target_class = 'authentication.CachedJWTAuthentication'
+
+
+def schema_cache_key(version=None):
+    return SCHEMA_CACHE_KEY.format(version or '', translation.get_language())
+
+
+def build_schema(version=None):
+    """Generate the public OpenAPI schema and store it for CachedSpectacularAPIView"""
+    schema = SchemaGenerator(api_version=version).get_schema(request=None, public=True)
+    tiered_cache.set(schema_cache_key(version), schema, settings.SCHEMA_CACHE_TIMEOUT)
+    return schema
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """
+    SpectacularAPIView serving the schema from the cache; generating it walks every view
+    and serializer. `manage.py warm_caches` regenerates it after a deploy.
+    """
+    def _get_schema_response(self, request):
+        version = self.api_version or request.version or self._get_version_parameter(request)
+        schema = tiered_cache.get(schema_cache_key(version)) or build_schema(version)
+        return Response(
+            data=schema,
+            headers={"Content-Disposition": f'inline; filename="{self._get_filename(request, version)}"'}
+        )
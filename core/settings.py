@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'middleware.RoleMiddleware',  # Add this line
+    'middleware.VisitorIdMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -102,7 +104,7 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PERMISSION_CLASSES': [
@@ -116,8 +118,81 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'pagination.KeysetPagination',
+    'PAGE_SIZE': env.int('API_PAGE_SIZE', default=20),
 }
 
+# Shared cache, e.g. CACHE_URL=redis://127.0.0.1:6379/1 in production or filecache:///tmp/django_cache
+# to share between local processes; each process gets its own memory cache by default
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Per-worker memory tier in front of the shared cache: maximum entries and seconds each is kept
+LOCAL_CACHE_MAX_ENTRIES = env.int('LOCAL_CACHE_MAX_ENTRIES', default=1000)
+LOCAL_CACHE_TTL = env.int('LOCAL_CACHE_TTL', default=60)
+
+# Single-flight recomputation of hot cache entries: how long other requests wait for the one
+# computing a key before computing it themselves, and how often they check (seconds)
+SINGLE_FLIGHT_LOCK_TIMEOUT = env.int('SINGLE_FLIGHT_LOCK_TIMEOUT', default=10)
+SINGLE_FLIGHT_POLL_INTERVAL = env.float('SINGLE_FLIGHT_POLL_INTERVAL', default=0.05)
+
+# Seconds the analytics dashboard for one user scope and time range is reused
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=60)
+
+# Seconds an anonymous catalog response stays cached; writes invalidate it earlier. 0 disables the cache
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+
+# Seconds a serialized product stays cached for list/cart/order responses; keys change with the product
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', default=3600)
+
+# Seconds a .cached() query result is kept; writes to the tables it reads invalidate it earlier
+QUERY_CACHE_TIMEOUT = env.int('QUERY_CACHE_TIMEOUT', default=3600)
+
+# Upper bound for the ?page_size= query parameter on paginated endpoints
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=100)
+
+# Rows read and serialized per chunk by ?stream=true list exports (see renderers.StreamingListMixin)
+STREAM_CHUNK_SIZE = env.int('STREAM_CHUNK_SIZE', default=500)
+
+# Render product and order lists from .values() rows instead of model instances (same output, less CPU)
+FAST_LIST_SERIALIZATION = env.bool('FAST_LIST_SERIALIZATION', default=False)
+
+# Product/category name autocomplete: maximum indexed names per worker and rebuild interval in seconds
+AUTOCOMPLETE_MAX_ITEMS = env.int('AUTOCOMPLETE_MAX_ITEMS', default=100000)
+AUTOCOMPLETE_REBUILD_INTERVAL = env.int('AUTOCOMPLETE_REBUILD_INTERVAL', default=600)
+
+# Seconds the category tree (with product counts) stays cached; it is also invalidated on change
+CATEGORY_TREE_CACHE_TIMEOUT = env.int('CATEGORY_TREE_CACHE_TIMEOUT', default=3600)
+
+# Seconds the generated OpenAPI schema is served from the cache; `manage.py warm_caches` replaces it
+SCHEMA_CACHE_TIMEOUT = env.int('SCHEMA_CACHE_TIMEOUT', default=86400)
+
+# Signed cookie identifying anonymous visitors (see middleware.VisitorIdMiddleware), and its lifetime in seconds
+VISITOR_COOKIE_NAME = env('VISITOR_COOKIE_NAME', default='visitor_id')
+VISITOR_COOKIE_AGE = env.int('VISITOR_COOKIE_AGE', default=365 * 24 * 60 * 60)
+
+# Product view tracking (see products/tracking.py): events held in memory per worker before new
+# ones are dropped, rows per bulk insert, seconds between flushes, and an optional spool path
+# that keeps unwritten events across a crash (each process appends its pid, e.g. /var/spool/app/views.log.1234)
+PRODUCT_VIEW_BUFFER_SIZE = env.int('PRODUCT_VIEW_BUFFER_SIZE', default=10000)
+PRODUCT_VIEW_BATCH_SIZE = env.int('PRODUCT_VIEW_BATCH_SIZE', default=500)
+PRODUCT_VIEW_FLUSH_INTERVAL = env.float('PRODUCT_VIEW_FLUSH_INTERVAL', default=2.0)
+PRODUCT_VIEW_SPOOL_PATH = env('PRODUCT_VIEW_SPOOL_PATH', default='')
+# Record one view per (viewer, product) per this many seconds (0 records every view), and the
+# most (viewer, product) pairs each worker remembers for that
+PRODUCT_VIEW_DEDUPE_WINDOW = env.int('PRODUCT_VIEW_DEDUPE_WINDOW', default=1800)
+PRODUCT_VIEW_DEDUPE_MAX_KEYS = env.int('PRODUCT_VIEW_DEDUPE_MAX_KEYS', default=200000)
+
+# Cache warm-up (see products/warmup.py): run it in the background when a worker starts,
+# how many of the most viewed products to warm, over how many days of views, and on how many threads
+WARM_CACHES_ON_STARTUP = env.bool('WARM_CACHES_ON_STARTUP', default=False)
+WARM_CACHES_TOP_PRODUCTS = env.int('WARM_CACHES_TOP_PRODUCTS', default=100)
+WARM_CACHES_VIEW_DAYS = env.int('WARM_CACHES_VIEW_DAYS', default=7)
+WARM_CACHES_WORKERS = env.int('WARM_CACHES_WORKERS', default=4)
+# Host that warmed responses are rendered for (response cache keys and absolute URLs include it)
+WARM_CACHES_HOST = env('WARM_CACHES_HOST', default='localhost')
+
 
 
 SIMPLE_JWT = {
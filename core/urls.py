@@ -4,7 +4,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+from core.schema import CachedSpectacularAPIView
 from users.views import UserViewSet, user_login
 
 router = DefaultRouter()
@@ -15,7 +16,7 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/auth/login/', user_login, name='user_login'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/products/', include('products.urls')),
     path('api/orders/', include('orders.urls')),
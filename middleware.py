@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from django.http import HttpResponseForbidden
 from django.urls import resolve
 
@@ -40,3 +43,57 @@ class RoleMiddleware:
         # If all checks pass, continue with the request
         return self.get_response(request)
 
+
+
+VISITOR_COOKIE_SALT = 'middleware.visitor_id'
+
+def get_visitor_id(request):
+    """
+    The anonymous visitor id of a request (DRF or Django), assigning a new one that
+    VisitorIdMiddleware sends back as a cookie when the visitor has none yet.
+    """
+    request = getattr(request, '_request', request)
+    if getattr(request, 'visitor_id', None) is None:
+        request.visitor_id = uuid.uuid4().hex
+        request.new_visitor_id = True
+    return request.visitor_id
+
+def get_visitor_keys(request):
+    """
+    Keys telling repeat anonymous requests apart: the visitor id, plus the client IP and
+    user agent when the id was only assigned in this request. Clients that don't keep
+    cookies (most bots) get a new visitor id on every request.
+    """
+    visitor_id = get_visitor_id(request)
+    request = getattr(request, '_request', request)
+    keys = [('visitor', visitor_id)]
+    if request.new_visitor_id:
+        keys.append(('client', request.META.get('REMOTE_ADDR', ''), request.META.get('HTTP_USER_AGENT', '')))
+    return keys
+
+class VisitorIdMiddleware:
+    """
+    Identify anonymous visitors with a signed cookie instead of a session.
+    The id lives only in the cookie, so tracking anonymous browsing (product views, searches)
+    writes no session rows. A cookie is only issued once get_visitor_id() has been called.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        # A missing or tampered cookie reads as None
+        request.visitor_id = request.get_signed_cookie(settings.VISITOR_COOKIE_NAME, default=None, salt=VISITOR_COOKIE_SALT)
+        request.new_visitor_id = False
+        response = self.get_response(request)
+        if request.new_visitor_id:
+            response.set_signed_cookie(
+                settings.VISITOR_COOKIE_NAME,
+                request.visitor_id,
+                salt=VISITOR_COOKIE_SALT,
+                max_age=settings.VISITOR_COOKIE_AGE,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,47 @@
+from collections import defaultdict
+
+from products.fast_serializers import FastSerializer, FastProductSerializer
+from products.models import Product
+from .models import OrderItem, Payment
+from .serializers import OrderSerializer, OrderItemSerializer, PaymentSerializer
+
+
+class FastPaymentSerializer(FastSerializer):
+    serializer_class = PaymentSerializer
+
+
+class FastOrderItemSerializer(FastSerializer):
+    serializer_class = OrderItemSerializer
+    
+    def values(self, queryset, *extra_lookups):
+        # subtotal is computed from these two columns
+        return super().values(queryset, 'price', 'quantity', *extra_lookups)
+    
+    def related_product_details(self, rows):
+        fast = FastProductSerializer(self.serializer.fields['product_details'])
+        product_rows = list(fast.values(Product.objects.filter(pk__in={row['product'] for row in rows})))
+        by_id = {product_row['id']: product for product_row, product in zip(product_rows, fast.serialize(product_rows))}
+        return lambda row: by_id[row['product']]
+    
+    def related_subtotal(self, rows):
+        field = self.serializer.fields['subtotal']
+        return lambda row: field.to_representation(row['price'] * row['quantity'])
+
+
+class FastOrderSerializer(FastSerializer):
+    serializer_class = OrderSerializer
+    
+    def related_items(self, rows):
+        fast = FastOrderItemSerializer(self.serializer.fields['items'].child)
+        queryset = OrderItem.objects.filter(order_id__in=[row['id'] for row in rows]).order_by('id')
+        item_rows = list(fast.values(queryset, 'order', 'product'))
+        items = defaultdict(list)
+        for item_row, item in zip(item_rows, fast.serialize(item_rows)):
+            items[item_row['order']].append(item)
+        return lambda row: items[row['id']]
+    
+    def related_payment(self, rows):
+        fast = FastPaymentSerializer(self.serializer.fields['payment'])
+        payment_rows = list(fast.values(Payment.objects.filter(order_id__in=[row['id'] for row in rows]), 'order'))
+        by_order = {payment_row['order']: payment for payment_row, payment in zip(payment_rows, fast.serialize(payment_rows))}
+        return lambda row: by_order.get(row['id'])
@@ -21,6 +21,12 @@ class Order(models.Model):
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ]
+    
     def __str__(self):
         return f"Order {self.id} by {self.customer.username}"
 
@@ -1,10 +1,10 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, Payment
-from products.serializers import ProductSerializer
+from products.serializers import ProductSerializer, DynamicFieldsMixin
 from products.models import Product
 from carts.models import Cart
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_details = ProductSerializer(source='product', read_only=True)
     subtotal = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     
@@ -19,7 +19,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = ['id', 'order', 'amount', 'payment_method', 'status', 'transaction_id', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     payment = PaymentSerializer(read_only=True)
     customer_username = serializers.CharField(source='customer.username', read_only=True)
@@ -1,3 +1,54 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Category, Product, ProductImage
+from products.tests import decode_columnar
+from .models import Order, OrderItem, Payment
+
+User = get_user_model()
+
+class FastOrderListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user('customer', 'customer@test.com', 'password123')
+        self.client.force_authenticate(user=self.customer)
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Books')
+        products = [
+            Product.objects.create(name=f'Book {i}', description='Description', price='12.50', stock=5, category=category, seller=seller)
+            for i in range(2)
+        ]
+        ProductImage.objects.create(product=products[0], image='products/book.jpg')
+        for paid in [True, False]:
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal('37.50'), shipping_address='Street 1')
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1 + product.pk % 2, price=product.price)
+            if paid:
+                Payment.objects.create(order=order, amount=order.total_amount, payment_method='paypal')
+
+    def test_fast_list_output_is_byte_identical(self):
+        for params in [{}, {'fields': 'id,items.subtotal,items.product_details.name'}]:
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get('/api/orders/', params)
+            with override_settings(FAST_LIST_SERIALIZATION=True):
+                actual = self.client.get('/api/orders/', params)
+            self.assertEqual(actual.status_code, 200)
+            self.assertEqual(actual.content, expected.content, params)
+
+    def test_streamed_list_matches_the_paginated_items(self):
+        expected = self.client.get('/api/orders/').json()['results']
+        with override_settings(STREAM_CHUNK_SIZE=1):
+            response = self.client.get('/api/orders/', {'stream': 'true'})
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(sorted(streamed, key=lambda order: order['id']), sorted(expected, key=lambda order: order['id']))
+
+    def test_columnar_list(self):
+        expected = self.client.get('/api/orders/').json()['results']
+        payload = self.client.get('/api/orders/', {'format': 'columnar'}).json()
+        self.assertEqual(payload['dictionaries']['shipping_address'], ['Street 1'])
+        self.assertEqual(decode_columnar(payload), expected)
@@ -1,20 +1,27 @@
 from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 from .models import Order, OrderItem, Payment
 from .serializers import (
     OrderSerializer, OrderItemSerializer, PaymentSerializer, 
     OrderCreateSerializer, OrderStatusUpdateSerializer
 )
+from .fast_serializers import FastOrderSerializer  # noqa: F401 (registers the fast list path)
 from carts.models import Cart
 from products.models import Product
+from products.serializers import ProductSerializer
+from products.fast_serializers import fast_list_data
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
 from permissions import IsAdmin, IsSellerOrAdmin, IsOrderCustomer
+from renderers import ColumnarJSONRenderer, StreamingListMixin
 
-class OrderViewSet(mixins.ListModelMixin,
+class OrderViewSet(StreamingListMixin,
+                   mixins.ListModelMixin,
                    mixins.RetrieveModelMixin,
                    viewsets.GenericViewSet):
     """
@@ -22,6 +29,8 @@ class OrderViewSet(mixins.ListModelMixin,
     """
     queryset = Order.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsOrderCustomer]
+    # ?format=columnar for bulk consumers of the list endpoint
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
 
     def get_serializer_class(self):
         if self.action == 'checkout':
@@ -33,13 +42,44 @@ class OrderViewSet(mixins.ListModelMixin,
     def get_queryset(self):
         user = self.request.user
         if user.is_staff or user.role == 'admin':
-            return Order.objects.all()
+            queryset = Order.objects.all()
         elif user.role == 'seller':
             # Get orders that contain products sold by this seller
-            return Order.objects.filter(items__product__seller=user).distinct()
+            queryset = Order.objects.filter(items__product__seller=user).distinct()
         else:
             # Regular customers can only see their own orders
-            return Order.objects.filter(customer=user)
+            queryset = Order.objects.filter(customer=user)
+        
+        if self.action in ['list', 'retrieve']:
+            # Load items and only the product data that will be rendered
+            product_fields = ProductSerializer.get_selected_fields(self.request, 'items.product_details')
+            queryset = queryset.select_related('customer', 'payment').prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.order_by('id').prefetch_related(
+                    Prefetch('product', queryset=Product.objects.with_related(product_fields))
+                ))
+            )
+        return queryset
+    
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='stream', description='Return every order as one streamed, unpaginated JSON array', required=False, type=bool, location=OpenApiParameter.QUERY),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        streamed = self.stream_list(queryset)
+        if streamed is not None:
+            return streamed
+        data = fast_list_data(self, queryset)
+        if data is None:
+            page = self.paginate_queryset(queryset)
+            # Products are rendered from the fragment cache, serializing only the misses
+            products = [item.product for order in page for item in order.items.all()]
+            fragments = ProductSerializer.load_fragments(products, request, 'items.product_details')
+            context = {**self.get_serializer_context(), 'product_fragments': fragments}
+            data = self.get_serializer(page, many=True, context=context).data
+            fragments.save()
+        return self.get_paginated_response(data)
     
     @extend_schema(
         request=OpenApiTypes.OBJECT,
@@ -0,0 +1,129 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination for list endpoints.
+    Pages are fetched with a WHERE on the ordering columns instead of an OFFSET scan,
+    so each page costs O(page size) and stays stable while new rows are inserted.
+
+    The cursor holds the values of every ordering column of the row it stops at, and the
+    next page starts strictly after that row in the full ordering. Unlike DRF's cursor
+    (first column plus an offset capped at 1000) this pages through any number of rows
+    tied on the sort column. The ordering must end in a unique column and its columns
+    must not be NULL.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor or (False, None)
+
+        ordering = [self._reversed(name) for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        # One extra row tells whether there is a page after this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        if self.page:
+            self.next_position = self._position(self.page[-1])
+            self.previous_position = self._position(self.page[0])
+        else:
+            # Past either end: step back from the cursor's own row
+            self.next_position = self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(reverse=True, position=self.previous_position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = json.loads(b64decode(encoded.encode('ascii'), validate=True))
+            cursor = Cursor(reverse=bool(tokens.get('r')), position=tokens['p'])
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(cursor.position, list) or len(cursor.position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.position}
+        if cursor.reverse:
+            tokens['r'] = 1
+        encoded = b64encode(json.dumps(tokens, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _position(self, item):
+        # Values are kept as strings; the filter converts them back through the field
+        if isinstance(item, dict):
+            return [str(item[name.lstrip('-')]) for name in self.ordering]
+        return [str(item.serializable_value(name.lstrip('-'))) for name in self.ordering]
+
+    @staticmethod
+    def _reversed(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Rows strictly after `position` in `ordering`: a tie on every earlier column and a
+        later value in the next one. The leading range on the first column keeps it an
+        index range scan.
+        """
+        def lookup(name, strict):
+            suffix = ('lt' if name.startswith('-') else 'gt') + ('' if strict else 'e')
+            return f'{name.lstrip("-")}__{suffix}'
+
+        condition = Q()
+        for index in range(len(ordering)):
+            ties = {name.lstrip('-'): value for name, value in zip(ordering[:index], position)}
+            condition |= Q(**ties, **{lookup(ordering[index], True): position[index]})
+        return Q(**{lookup(ordering[0], False): position[0]}) & condition
+
+class IdKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination on the primary key, for models without a created_at column.
+    """
+    ordering = ('id',)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        from caching import track_table_versions
+        from . import signals  # noqa: F401
+        from .models import Category, Product
+        
+        track_table_versions(Category, Product)
@@ -0,0 +1,214 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Category, Product
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index for typeahead over product and category names.
+
+    Entries are kept in a sorted list and looked up with bisect, so a lookup costs
+    O(log n) plus a bounded scan of the matching range. Every word of a name starts
+    an entry, so "sho" matches "Running shoe". Once max_items names are indexed the
+    least popular one is evicted to make room for a more popular one; a min-heap of the
+    weights finds it without scanning every item.
+    """
+    
+    def __init__(self, max_items, max_scan=500):
+        self.max_items = max_items
+        self.max_scan = max_scan
+        self.entries = []  # (key, kind, id) tuples, sorted
+        self.items = {}    # (kind, id) -> (label, weight, keys)
+        # (weight, kind, id), least popular first; entries of removed or reweighted items
+        # are skipped when they reach the top
+        self.weights = []
+        self.lock = threading.RLock()
+    
+    def __len__(self):
+        return len(self.items)
+    
+    @classmethod
+    def from_items(cls, items, max_items, **kwargs):
+        """
+        An index of (kind, id, label, weight) items holding the max_items most popular,
+        built with one sort instead of an insort per key
+        """
+        index = cls(max_items, **kwargs)
+        items = heapq.nlargest(max_items, items, key=lambda item: item[3])
+        for kind, item_id, label, weight in items:
+            keys = cls.keys(label)
+            index.entries.extend((key, kind, item_id) for key in keys)
+            index.items[(kind, item_id)] = (label, weight, keys)
+            index.weights.append((weight, kind, item_id))
+        index.entries.sort()
+        heapq.heapify(index.weights)
+        return index
+    
+    @staticmethod
+    def keys(label):
+        # Every word of the name starts a key
+        words = normalize(label).split()
+        return [' '.join(words[start:]) for start in range(len(words))]
+    
+    def add(self, kind, item_id, label, weight=None):
+        with self.lock:
+            if weight is None:
+                # Keep the weight of an entry that is only being renamed
+                weight = self.items.get((kind, item_id), (None, 0))[1]
+            self.remove(kind, item_id)
+            if len(self.items) >= self.max_items:
+                lowest, lowest_weight = self._least_popular()
+                if lowest_weight >= weight:
+                    return
+                self.remove(*lowest)
+            
+            keys = self.keys(label)
+            for key in keys:
+                bisect.insort(self.entries, (key, kind, item_id))
+            self.items[(kind, item_id)] = (label, weight, keys)
+            heapq.heappush(self.weights, (weight, kind, item_id))
+            if len(self.weights) > 2 * len(self.items) + 64:
+                # Mostly stale entries; rebuild from the live items
+                self.weights = [(weight, kind, item_id) for (kind, item_id), (_, weight, _) in self.items.items()]
+                heapq.heapify(self.weights)
+    
+    def _least_popular(self):
+        while True:
+            weight, kind, item_id = self.weights[0]
+            item = self.items.get((kind, item_id))
+            if item is not None and item[1] == weight:
+                return (kind, item_id), weight
+            heapq.heappop(self.weights)
+    
+    def remove(self, kind, item_id):
+        with self.lock:
+            item = self.items.pop((kind, item_id), None)
+            if item is None:
+                return
+            for key in item[2]:
+                position = bisect.bisect_left(self.entries, (key, kind, item_id))
+                if position < len(self.entries) and self.entries[position] == (key, kind, item_id):
+                    del self.entries[position]
+    
+    def lookup(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect.bisect_left(self.entries, (prefix,))
+            candidates = set()
+            for key, kind, item_id in self.entries[start:start + self.max_scan]:
+                if not key.startswith(prefix):
+                    break
+                candidates.add((kind, item_id))
+            best = heapq.nlargest(limit, candidates, key=lambda item: self.items[item][1])
+            return [
+                {'type': kind, 'id': item_id, 'name': self.items[(kind, item_id)][0]}
+                for kind, item_id in best
+            ]
+
+
+_index = None
+_built_at = 0
+_build_lock = threading.Lock()
+# Held while the index is swapped or changed; item changes made while a rebuild is
+# reading the database are queued here and replayed onto the new index
+_update_lock = threading.Lock()
+_pending = None
+
+
+def build_index():
+    """Build a fresh index from the database, most popular products first"""
+    categories = Category.objects.annotate(product_count=Count('products')).values_list('id', 'name', 'product_count')
+    items = [('category', category_id, name, product_count) for category_id, name, product_count in categories.iterator()]
+    
+    # Fill the remaining capacity with the most viewed products
+    products = Product.objects.order_by('-view_count', '-id').values_list('id', 'name', 'view_count')
+    remaining = max(settings.AUTOCOMPLETE_MAX_ITEMS - len(items), 0)
+    items.extend(('product', product_id, name, view_count) for product_id, name, view_count in products[:remaining].iterator())
+    return PrefixIndex.from_items(items, settings.AUTOCOMPLETE_MAX_ITEMS)
+
+
+def _rebuild():
+    """Build a new index and swap it in; the caller holds _build_lock, released here"""
+    global _index, _built_at, _pending
+    try:
+        with _update_lock:
+            _pending = []
+        index = build_index()
+        with _update_lock:
+            for change in _pending:
+                change(index)
+            _index, _built_at = index, time.monotonic()
+    finally:
+        with _update_lock:
+            _pending = None
+        _build_lock.release()
+
+
+def _rebuild_in_background():
+    try:
+        _rebuild()
+    finally:
+        # The thread's own database connection
+        connection.close()
+
+
+def get_index():
+    """
+    The process-wide index, built on first use and rebuilt every
+    AUTOCOMPLETE_REBUILD_INTERVAL seconds to pick up popularity changes.
+    Only the first build makes callers wait; later rebuilds run on a background
+    thread while requests keep using the current index.
+    """
+    if _index is None:
+        _build_lock.acquire()
+        if _index is None:
+            _rebuild()
+        else:
+            _build_lock.release()
+    elif _expired() and _build_lock.acquire(blocking=False):
+        if _expired():
+            threading.Thread(target=_rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+        else:
+            # Another thread's rebuild finished in the meantime
+            _build_lock.release()
+    return _index
+
+
+def _expired():
+    return time.monotonic() - _built_at > settings.AUTOCOMPLETE_REBUILD_INTERVAL
+
+
+def _apply(change):
+    with _update_lock:
+        # Nothing to update until the index has been built
+        if _index is not None:
+            change(_index)
+        if _pending is not None:
+            _pending.append(change)
+
+
+def update_item(kind, item_id, label, weight=None):
+    _apply(lambda index: index.add(kind, item_id, label, weight))
+
+
+def remove_item(kind, item_id):
+    _apply(lambda index: index.remove(kind, item_id))
+
+
+def reset_index():
+    global _index
+    _index = None
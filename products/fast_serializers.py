@@ -0,0 +1,150 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.encoding import iri_to_uri
+from rest_framework import serializers
+
+from .models import ProductImage, RATING_VALUES
+from .serializers import ProductSerializer
+
+
+class FastSerializer:
+    """
+    Read-only, compiled equivalent of a DRF serializer that works on .values() rows.
+    
+    The field list is taken from a bound DRF serializer (so ?fields= and ?expand= still
+    apply) and compiled once into per-field extractors: plain columns are read from the
+    row and passed to the DRF field's own to_representation(), foreign keys are emitted
+    as their id, and nested or computed fields are filled by `related_<field>` methods
+    that batch-load their data for all rows at once. The output is identical to the
+    DRF serializer's, without the per-object attribute lookups.
+    """
+    serializer_class = None
+    registry = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        FastSerializer.registry[cls.serializer_class] = cls
+    
+    @classmethod
+    def for_serializer(cls, serializer):
+        """The fast serializer for a bound DRF serializer, or None when it has none"""
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        fast_class = cls.registry.get(type(serializer))
+        return fast_class(serializer) if fast_class else None
+    
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.request = serializer.context.get('request')
+        self.lookups = ['id']
+        self.extractors = []
+        for name, field in serializer.fields.items():
+            handler = getattr(self, f'related_{name}', None)
+            if handler is not None:
+                self.extractors.append((name, None, handler))
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) or field.source == '*':
+                raise TypeError(f'{type(self).__name__} has no handler for the {name} field')
+    
+            lookup = field.source.replace('.', '__')
+            # Related fields render the primary key, which is what .values() returns for a foreign key
+            formatter = None if isinstance(field, serializers.RelatedField) else field.to_representation
+            self.extractors.append((name, lookup, formatter))
+            if lookup not in self.lookups:
+                self.lookups.append(lookup)
+    
+    def values(self, queryset, *extra_lookups):
+        """The queryset as the .values() rows this serializer reads"""
+        lookups = self.lookups + [lookup for lookup in extra_lookups if lookup not in self.lookups]
+        return queryset.prefetch_related(None).values(*lookups)
+    
+    def serialize(self, rows):
+        rows = list(rows)
+        related = {
+            name: handler(rows)
+            for name, lookup, handler in self.extractors if lookup is None
+        }
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, formatter in self.extractors:
+                if lookup is None:
+                    item[name] = related[name](row)
+                    continue
+                value = row[lookup]
+                item[name] = value if value is None or formatter is None else formatter(value)
+            data.append(item)
+        return data
+    
+    def absolute_url(self, url):
+        """Same result as request.build_absolute_uri(url), without re-parsing the common case"""
+        if url.startswith('/') and not url.startswith('//') and '/./' not in url and '/../' not in url:
+            if not hasattr(self, '_scheme_host'):
+                self._scheme_host = self.request.build_absolute_uri('/')[:-1]
+            return iri_to_uri(self._scheme_host + url)
+        return self.request.build_absolute_uri(url)
+
+
+def fast_list_data(view, queryset):
+    """
+    Paginate and render a list view's queryset through its fast serializer.
+    Returns None when FAST_LIST_SERIALIZATION is off or the serializer has no fast equivalent.
+    """
+    if not settings.FAST_LIST_SERIALIZATION:
+        return None
+    fast = FastSerializer.for_serializer(view.get_serializer(many=True))
+    if fast is None:
+        return None
+    # The cursor holds every ordering column, so they have to be in the rows
+    ordering = [name.lstrip('-') for name in getattr(view.paginator, 'ordering', ())]
+    rows = fast.values(queryset, *ordering)
+    page = view.paginate_queryset(rows)
+    return fast.serialize(rows if page is None else page)
+
+
+class FastProductSerializer(FastSerializer):
+    serializer_class = ProductSerializer
+    
+    def load_images(self, rows):
+        """Image file names per product id, in id order; shared by primary_image and images"""
+        key = tuple(row['id'] for row in rows)
+        if getattr(self, '_images', (None,))[0] == key:
+            return self._images[1]
+        images = defaultdict(list)
+        queryset = ProductImage.objects.filter(product_id__in=[row['id'] for row in rows]).order_by('id')
+        for product_id, image_id, name in queryset.values_list('product_id', 'id', 'image'):
+            images[product_id].append((image_id, name))
+        self._images = (key, images)
+        return images
+    
+    def image_url(self, name, relative=False):
+        """The URL ProductSerializer renders for an image file: absolute with a request, else None (or relative)"""
+        if not name:
+            return None
+        if self.request is None and not relative:
+            return None
+        urls = self.__dict__.setdefault('_image_urls', {})
+        if name not in urls:
+            url = ProductImage._meta.get_field('image').storage.url(name)
+            urls[name] = url if self.request is None else self.absolute_url(url)
+        return urls[name]
+    
+    def related_primary_image(self, rows):
+        images = self.load_images(rows)
+        return lambda row: self.image_url(images[row['id']][0][1]) if images[row['id']] else None
+    
+    def related_images(self, rows):
+        images = self.load_images(rows)
+        # `image` is an ImageField, which falls back to the relative URL without a request
+        return lambda row: [
+            {'id': image_id, 'image': self.image_url(name, relative=True), 'image_url': self.image_url(name)}
+            for image_id, name in images[row['id']]
+        ]
+    
+    def related_rating_histogram(self, rows):
+        return lambda row: {str(rating): row[f'rating_{rating}_count'] for rating in RATING_VALUES}
+    
+    def values(self, queryset, *extra_lookups):
+        histogram = [f'rating_{rating}_count' for rating in RATING_VALUES] if 'rating_histogram' in self.serializer.fields else []
+        return super().values(queryset, *histogram, *extra_lookups)
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from caching import bump_version
+from products.models import Product, ProductCard, Review
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating columns of every product from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stats = Product.compute_rating_stats(Review.objects.all())
+        empty = Product.empty_rating_stats()
+        fields = list(empty)
+        update_fields = [*fields, 'updated_at']
+
+        batch = []
+        updated = 0
+        for product in Product.objects.only('id', *fields).iterator(chunk_size=batch_size):
+            values = stats.get(product.id, empty)
+            if all(getattr(product, field) == value for field, value in values.items()):
+                continue
+            for field, value in values.items():
+                setattr(product, field, value)
+            # Fragment cache keys and ETags follow updated_at, as with adjust_rating_stats()
+            product.updated_at = timezone.now()
+            batch.append(product)
+            if len(batch) >= batch_size:
+                updated += self.write_batch(batch, update_fields)
+                batch = []
+        if batch:
+            updated += self.write_batch(batch, update_fields)
+        # bulk_update sends no signals
+        bump_version('product')
+
+        self.stdout.write(self.style.SUCCESS(f'Updated rating stats for {updated} products'))
+
+    def write_batch(self, batch, fields):
+        Product.objects.bulk_update(batch, fields)
+        # The cards copy the rating columns and are normally refreshed by signals
+        ProductCard.refresh([product.pk for product in batch])
+        return len(batch)
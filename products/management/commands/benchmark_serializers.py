@@ -0,0 +1,69 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products.fast_serializers import FastProductSerializer
+from products.models import Category, Product, ProductImage
+from products.serializers import ProductSerializer
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF and fast (.values()) serialization paths on a page of generated products'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100, help='Products per page')
+        parser.add_argument('--rounds', type=int, default=50)
+        parser.add_argument('--expand', action='store_true', help='Also render the images list')
+
+    def handle(self, *args, **options):
+        count, rounds = options['products'], options['rounds']
+        path = '/api/products/?expand=images' if options['expand'] else '/api/products/'
+        request = Request(APIRequestFactory().get(path))
+
+        # Fixture rows are rolled back once the timings are taken
+        with transaction.atomic():
+            self.create_fixtures(count)
+            queryset = Product.objects.with_related(ProductSerializer.get_selected_fields(request)).order_by('-created_at', '-id')[:count]
+
+            def drf_path():
+                return ProductSerializer(list(queryset), many=True, context={'request': request}).data
+
+            def fast_path():
+                fast = FastProductSerializer(ProductSerializer(many=True, context={'request': request}).child)
+                return fast.serialize(fast.values(queryset))
+
+            if JSONRenderer().render(drf_path()) != JSONRenderer().render(fast_path()):
+                raise CommandError('The fast serializer output differs from ProductSerializer')
+
+            for name, render in [('drf', drf_path), ('fast', fast_path)]:
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    render()
+                elapsed = (time.perf_counter() - started) / rounds
+                self.stdout.write(f'{name:>5}: {elapsed * 1000:.2f} ms per page of {count} ({elapsed / count * 1e6:.1f} us per product)')
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Outputs are identical'))
+
+    def create_fixtures(self, count):
+        seller = CustomUser.objects.create_user('benchmark-seller', 'benchmark@example.com', role='seller')
+        category = Category.objects.create(name='Benchmark')
+        products = Product.objects.bulk_create(
+            Product(
+                name=f'Benchmark product {i}', description='Generated for the serializer benchmark',
+                price=Decimal('19.99') + i, discount_price=Decimal('9.99') if i % 3 == 0 else None,
+                stock=i, category=category, seller=seller, rating_count=i % 5, rating_1_count=i % 5,
+            )
+            for i in range(count)
+        )
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'products/benchmark-{product.pk}-{n}.jpg')
+            for product in products for n in range(2)
+        )
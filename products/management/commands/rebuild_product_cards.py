@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product, ProductCard
+
+
+class Command(BaseCommand):
+    help = 'Recreate the ProductCard listing rows of every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product_ids = Product.objects.order_by('id').values_list('id', flat=True)
+
+        refreshed = 0
+        batch = []
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) >= batch_size:
+                refreshed += ProductCard.refresh(batch)
+                batch = []
+        if batch:
+            refreshed += ProductCard.refresh(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {refreshed} product cards'))
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.warmup import warm_caches, warm_targets
+
+
+class Command(BaseCommand):
+    help = 'Precompute the category tree, most viewed products, category first pages and OpenAPI schema'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-products', type=int, default=settings.WARM_CACHES_TOP_PRODUCTS)
+        parser.add_argument('--view-days', type=int, default=settings.WARM_CACHES_VIEW_DAYS)
+        parser.add_argument('--workers', type=int, default=settings.WARM_CACHES_WORKERS)
+        parser.add_argument('--host', default=settings.WARM_CACHES_HOST,
+                            help='Host the responses are rendered for; it is part of the response cache key')
+        parser.add_argument('--accept', default='application/json',
+                            help='Accept header of the warmed responses; it is part of the response cache key')
+
+    def handle(self, *args, **options):
+        targets = warm_targets(options['top_products'], options['view_days'], options['host'], options['accept'])
+
+        def report(key, seconds, error):
+            if error is not None:
+                self.stderr.write(self.style.ERROR(f'{key}: failed after {seconds * 1000:.1f} ms ({error})'))
+            else:
+                self.stdout.write(f'{key}: {seconds * 1000:.1f} ms')
+
+        start = time.perf_counter()
+        results = warm_caches(targets, options['workers'], on_result=report)
+        failed = sum(1 for result in results if result[2] is not None)
+        elapsed = time.perf_counter() - start
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'Warmed {len(results) - failed} of {len(results)} keys in {elapsed:.2f} s'))
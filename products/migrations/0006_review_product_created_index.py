@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_rating_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_idx'),
+        ),
+    ]
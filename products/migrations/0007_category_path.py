@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:34
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.all())
+    by_id = {category.id: category for category in categories}
+
+    def build(category):
+        if not category.path:
+            parent = by_id.get(category.parent_id)
+            parent_path = build(parent) if parent else ''
+            category.path = f'{parent_path}{category.id:010d}/'
+            category.depth = category.path.count('/') - 1
+        return category.path
+
+    for category in categories:
+        build(category)
+    Category.objects.bulk_update(categories, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_review_product_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
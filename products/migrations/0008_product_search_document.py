@@ -0,0 +1,58 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:36
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['vector'], name='product_search_vector_idx')
+
+
+def create_search_index(apps, schema_editor):
+    # GIN indexes and tsvector columns only exist on PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ProductSearchDocument = apps.get_model('products', 'ProductSearchDocument')
+    schema_editor.add_index(ProductSearchDocument, SEARCH_INDEX)
+    schema_editor.execute("""
+        INSERT INTO products_productsearchdocument (product_id, vector)
+        SELECT p.id,
+               setweight(to_tsvector('english', coalesce(p.name, '')), 'A')
+               || setweight(to_tsvector('english', coalesce(c.name, '')), 'B')
+               || setweight(to_tsvector('english', coalesce(p.description, '')), 'C')
+        FROM products_product p
+        JOIN products_category c ON c.id = p.category_id
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    ProductSearchDocument = apps.get_model('products', 'ProductSearchDocument')
+    schema_editor.remove_index(ProductSearchDocument, SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='products.product')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True)),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='productsearchdocument', index=SEARCH_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_category_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='products.product')),
+                ('name', models.CharField(max_length=255)),
+                ('effective_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('primary_image', models.CharField(blank=True, default='', max_length=100)),
+                ('rating_average', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('category_path', models.CharField(db_index=True, max_length=255)),
+                ('seller_username', models.CharField(max_length=150)),
+                ('view_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at', 'product'], name='card_created_idx'), models.Index(fields=['effective_price', 'product'], name='card_price_idx'), models.Index(fields=['rating_average', 'product'], name='card_rating_idx'), models.Index(fields=['view_count', 'product'], name='card_popularity_idx'), models.Index(fields=['seller', 'created_at', 'product'], name='card_seller_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_card'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productview',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
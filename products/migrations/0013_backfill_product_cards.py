@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 500
+
+
+def backfill_cards(apps, schema_editor):
+    # Products created before 0011 have no card until something touches them;
+    # this mirrors ProductCard.refresh() on the historical models
+    Product = apps.get_model('products', 'Product')
+    ProductCard = apps.get_model('products', 'ProductCard')
+    ProductImage = apps.get_model('products', 'ProductImage')
+
+    primary_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('id').values('image')[:1]
+    products = Product.objects.filter(card__isnull=True).order_by('id').annotate(
+        card_price=Coalesce('discount_price', 'price'),
+        card_image=Subquery(primary_image),
+    ).values(
+        'id', 'name', 'stock', 'rating_average', 'rating_count', 'view_count', 'created_at',
+        'card_price', 'card_image', 'category__path', 'seller_id', 'seller__username',
+    )
+    cards = []
+    for row in products.iterator(chunk_size=BATCH_SIZE):
+        cards.append(ProductCard(
+            product_id=row['id'],
+            name=row['name'],
+            effective_price=row['card_price'],
+            in_stock=row['stock'] > 0,
+            primary_image=row['card_image'] or '',
+            rating_average=row['rating_average'],
+            rating_count=row['rating_count'],
+            category_path=row['category__path'],
+            seller_id=row['seller_id'],
+            seller_username=row['seller__username'],
+            view_count=row['view_count'],
+            created_at=row['created_at'],
+        ))
+        if len(cards) >= BATCH_SIZE:
+            ProductCard.objects.bulk_create(cards)
+            cards = []
+    ProductCard.objects.bulk_create(cards)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_view_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_cards, migrations.RunPython.noop),
+    ]
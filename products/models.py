@@ -1,15 +1,135 @@
-from django.db import models
+from django.db import models, transaction, connection
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Concat, NullIf, Substr
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.utils import timezone
+from caching import CachedQuerySet, bump_version, get_versions, tiered_cache
+
+RATING_VALUES = range(1, 6)
 
 class Category(models.Model):
+    TREE_CACHE_KEY = 'products:category_tree'
+    
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path of zero-padded ancestor ids including this one, e.g. "0000000001/0000000004/".
+    # Maintained by save(); a subtree is every category whose path starts with this one.
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CachedQuerySet.as_manager()
     
     class Meta:
         verbose_name_plural = "Categories"
     
     def __str__(self):
         return self.name
+    
+    def build_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        return f'{parent_path}{self.pk:010d}/'
+    
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        
+        old_path, old_depth = self.path, self.depth
+        new_path = self.build_path()
+        if new_path == old_path:
+            return
+        
+        self.path, self.depth = new_path, new_path.count('/') - 1
+        Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        if old_path:
+            # The category moved: rewrite the path prefix of all its descendants in one UPDATE
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (self.depth - old_depth),
+            )
+            ProductCard.objects.filter(category_path__startswith=old_path).update(
+                category_path=Concat(Value(new_path), Substr('category_path', len(old_path) + 1)),
+            )
+    
+    def get_descendants(self, include_self=False):
+        descendants = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+    
+    @classmethod
+    def get_tree(cls):
+        """
+        The full category tree with direct and subtree product counts, served from the cache.
+        Building it costs two queries: the categories and the product counts per category.
+        """
+        # Keyed by a version so every worker's memory tier drops it on invalidation
+        key = f'{cls.TREE_CACHE_KEY}:{get_versions([cls.TREE_CACHE_KEY])[0]}'
+        tree = tiered_cache.get(key)
+        if tree is None:
+            tree = cls.build_tree()
+            tiered_cache.set(key, tree, settings.CATEGORY_TREE_CACHE_TIMEOUT)
+        return tree
+    
+    @classmethod
+    def build_tree(cls):
+        counts = dict(
+            Product.objects.order_by().values_list('category_id').annotate(count=Count('id'))
+        )
+        nodes = {}
+        roots = []
+        # Ordering by path guarantees parents are seen before their children
+        for category in cls.objects.order_by('path').values('id', 'name', 'parent_id', 'depth'):
+            node = {
+                'id': category['id'],
+                'name': category['name'],
+                'parent': category['parent_id'],
+                'depth': category['depth'],
+                'product_count': counts.get(category['id'], 0),
+                'subtree_product_count': counts.get(category['id'], 0),
+                'children': [],
+            }
+            nodes[node['id']] = node
+            parent = nodes.get(node['parent'])
+            (parent['children'] if parent else roots).append(node)
+        
+        # Roll subtree counts up from the deepest categories
+        for node in sorted(nodes.values(), key=lambda node: node['depth'], reverse=True):
+            parent = nodes.get(node['parent'])
+            if parent:
+                parent['subtree_product_count'] += node['subtree_product_count']
+        return roots
+    
+    @classmethod
+    def invalidate_tree(cls):
+        bump_version(cls.TREE_CACHE_KEY)
+
+class ProductQuerySet(CachedQuerySet):
+    def with_related(self, fields=None):
+        """
+        Load everything ProductSerializer renders in a fixed number of queries:
+        one for the products (seller and category joined) and one for the images.
+        Pass the rendered field names as `fields` to skip what isn't needed.
+        """
+        def wants(*names):
+            return fields is None or any(name in fields for name in names)
+        
+        queryset = self
+        related = [name for name, field_name in [('seller', 'seller_username'), ('category', 'category_name')] if wants(field_name)]
+        if related:
+            queryset = queryset.select_related(*related)
+        if wants('images', 'primary_image'):
+            # Ordered so every serialization path lists images the same way
+            queryset = queryset.prefetch_related(models.Prefetch('images', queryset=ProductImage.objects.order_by('id')))
+        if not wants('description'):
+            queryset = queryset.defer('description')
+        return queryset
+    
+    def with_effective_price(self):
+        """Annotate the price a customer pays: the discount price when set, otherwise the price"""
+        return self.annotate(effective_price=Coalesce('discount_price', 'price'))
 
 class Product(models.Model):
     name = models.CharField(max_length=255)
@@ -22,8 +142,189 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Rating aggregates, maintained from Review signals (see products/signals.py)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # Popularity counter, incremented when a ProductView is recorded
+    view_count = models.PositiveIntegerField(default=0)
+    
+    objects = ProductQuerySet.as_manager()
+    # Bumped on every view; updating it alone doesn't invalidate cached queries
+    volatile_fields = ('view_count',)
+    
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            # Catalog filters and sort orders (see ProductViewSet.list)
+            models.Index(fields=['category', 'created_at', 'id'], name='product_category_created_idx'),
+            models.Index(fields=['seller', 'created_at', 'id'], name='product_seller_created_idx'),
+            models.Index(Coalesce('discount_price', 'price'), F('id'), name='product_effective_price_idx'),
+            models.Index(fields=['rating_average', 'id'], name='product_rating_idx'),
+            models.Index(fields=['view_count', 'id'], name='product_popularity_idx'),
+        ]
+    
     def __str__(self):
         return self.name
+    
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}_count') for rating in RATING_VALUES}
+    
+    @classmethod
+    def touch(cls, product_id):
+        """Bump updated_at for changes to what the API renders for a product (reviews, images)"""
+        cls.objects.filter(pk=product_id).update(updated_at=timezone.now())
+    
+    @classmethod
+    def adjust_rating_stats(cls, product_id, rating, delta):
+        """Add (delta=1) or remove (delta=-1) one review rating in a single UPDATE"""
+        count = F('rating_count') + delta
+        total = F('rating_sum') + delta * rating
+        cls.objects.filter(pk=product_id).update(
+            updated_at=timezone.now(),
+            rating_count=count,
+            rating_sum=total,
+            rating_average=Coalesce(Cast(total, FloatField()) / NullIf(count, 0), 0.0),
+            **{f'rating_{rating}_count': F(f'rating_{rating}_count') + delta}
+        )
+    
+    @staticmethod
+    def compute_rating_stats(reviews):
+        """Aggregate a Review queryset into the rating columns, grouped by product"""
+        stats = reviews.order_by().values('product_id').annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{rating}_count': Count('id', filter=Q(rating=rating)) for rating in RATING_VALUES}
+        )
+        result = {}
+        for row in stats:
+            product_id = row.pop('product_id')
+            row['rating_average'] = row['rating_sum'] / row['rating_count']
+            result[product_id] = row
+        return result
+    
+    @classmethod
+    def refresh_rating_stats(cls, product_id):
+        """Recompute the rating columns of one product from its reviews"""
+        stats = cls.compute_rating_stats(Review.objects.filter(product_id=product_id))
+        cls.objects.filter(pk=product_id).update(updated_at=timezone.now(), **stats.get(product_id, cls.empty_rating_stats()))
+    
+    @staticmethod
+    def empty_rating_stats():
+        stats = {'rating_count': 0, 'rating_sum': 0, 'rating_average': 0}
+        stats.update({f'rating_{rating}_count': 0 for rating in RATING_VALUES})
+        return stats
+
+class ProductSearchDocument(models.Model):
+    """
+    Full-text search vector of a product, kept out of the product row so that
+    listings don't load it. Only maintained on PostgreSQL; other databases use
+    the in-process fallback in products/search.py.
+    """
+    SEARCH_CONFIG = 'english'
+    
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    vector = SearchVectorField(null=True)
+    
+    class Meta:
+        indexes = [
+            GinIndex(fields=['vector'], name='product_search_vector_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Search document for product {self.product_id}"
+    
+    @classmethod
+    def document_vector(cls):
+        """Weighted vector over the product name (A), category name (B) and description (C)"""
+        product = Product.objects.filter(pk=OuterRef('product_id'))
+        return (
+            SearchVector(Subquery(product.values('name')), weight='A', config=cls.SEARCH_CONFIG)
+            + SearchVector(Subquery(product.values('category__name')), weight='B', config=cls.SEARCH_CONFIG)
+            + SearchVector(Subquery(product.values('description')), weight='C', config=cls.SEARCH_CONFIG)
+        )
+    
+    @classmethod
+    def refresh(cls, product_ids):
+        """Create or rebuild the search documents of the given products"""
+        if connection.vendor != 'postgresql':
+            return
+        product_ids = list(product_ids)
+        cls.objects.bulk_create([cls(product_id=product_id) for product_id in product_ids], ignore_conflicts=True)
+        cls.objects.filter(product_id__in=product_ids).update(vector=cls.document_vector())
+
+class ProductCard(models.Model):
+    """
+    Denormalized listing row of a product: everything a catalog card shows, in one table,
+    so listing, filtering and sorting never join. Maintained from signals on the source
+    models (see products/signals.py); `manage.py rebuild_product_cards` recreates it.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    name = models.CharField(max_length=255)
+    effective_price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField(default=False)
+    # Storage name of the first image, as stored in ProductImage.image
+    primary_image = models.CharField(max_length=100, blank=True, default='')
+    rating_average = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Category.path of the product's category, so subtree filters are a prefix scan
+    category_path = models.CharField(max_length=255, db_index=True)
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    seller_username = models.CharField(max_length=150)
+    view_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    
+    # Columns copied from the product by refresh()
+    PRODUCT_FIELDS = ['name', 'rating_average', 'rating_count', 'view_count', 'created_at']
+    
+    class Meta:
+        indexes = [
+            # Sort orders of the cards endpoint (see ProductViewSet.SORT_ORDERINGS)
+            models.Index(fields=['created_at', 'product'], name='card_created_idx'),
+            models.Index(fields=['effective_price', 'product'], name='card_price_idx'),
+            models.Index(fields=['rating_average', 'product'], name='card_rating_idx'),
+            models.Index(fields=['view_count', 'product'], name='card_popularity_idx'),
+            models.Index(fields=['seller', 'created_at', 'product'], name='card_seller_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Card for product {self.product_id}"
+    
+    @classmethod
+    def refresh(cls, product_ids):
+        """Create or rebuild the cards of the given products with one SELECT and one upsert"""
+        primary_image = ProductImage.objects.filter(product=OuterRef('pk')).order_by('id').values('image')[:1]
+        products = Product.objects.filter(pk__in=list(product_ids)).order_by().annotate(
+            card_price=Coalesce('discount_price', 'price'),
+            card_image=Subquery(primary_image),
+        ).values(*cls.PRODUCT_FIELDS, 'id', 'stock', 'card_price', 'card_image', 'category__path', 'seller_id', 'seller__username')
+        cards = [
+            cls(
+                product_id=row['id'],
+                effective_price=row['card_price'],
+                in_stock=row['stock'] > 0,
+                primary_image=row['card_image'] or '',
+                category_path=row['category__path'],
+                seller_id=row['seller_id'],
+                seller_username=row['seller__username'],
+                **{name: row[name] for name in cls.PRODUCT_FIELDS}
+            )
+            for row in products
+        ]
+        cls.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=cls.PRODUCT_FIELDS + ['effective_price', 'in_stock', 'primary_image', 'category_path', 'seller', 'seller_username'],
+        )
+        return len(cards)
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -54,13 +355,17 @@ class ProductImage(models.Model):
 class Review(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    rating = models.PositiveSmallIntegerField(choices=[(i, i) for i in range(1, 6)])
+    rating = models.PositiveSmallIntegerField(choices=[(i, i) for i in RATING_VALUES])
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            # Backs the paginated /products/<id>/reviews/ endpoint
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_created_idx'),
+        ]
     
     def __str__(self):
         return f"Review by {self.user} for {self.product.name}"
@@ -69,7 +374,8 @@ class ProductView(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='views')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
     session_id = models.CharField(max_length=255, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the view happens; rows are written later in batches (see products/tracking.py)
+    timestamp = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         return f"View of {self.product.name}"
@@ -0,0 +1,56 @@
+from functools import reduce
+import operator
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import ProductSearchDocument
+
+# Same relative weights as PostgreSQL's ts_rank defaults for A, B and C
+FALLBACK_WEIGHTS = {'name': 1.0, 'category__name': 0.4, 'description': 0.2}
+
+# Upper bound on the rows the in-process fallback ranks in Python
+FALLBACK_CANDIDATE_LIMIT = 1000
+
+
+def search_products(queryset, query, limit):
+    """
+    Return the ids of the best matching products for a free-text query, best first.
+    Uses the maintained tsvector documents on PostgreSQL and an in-process ranking elsewhere.
+    """
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, query, limit)
+    return _search_fallback(queryset, query, limit)
+
+
+def _search_postgres(queryset, query, limit):
+    search_query = SearchQuery(query, search_type='websearch', config=ProductSearchDocument.SEARCH_CONFIG)
+    return list(
+        queryset.filter(search_document__vector=search_query)
+        .annotate(rank=SearchRank(F('search_document__vector'), search_query))
+        .order_by('-rank', '-id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def _search_fallback(queryset, query, limit):
+    terms = re.findall(r'\w+', query.lower())
+    if not terms:
+        return []
+    
+    matches = reduce(operator.or_, (
+        Q(**{f'{field}__icontains': term}) for term in terms for field in FALLBACK_WEIGHTS
+    ))
+    candidates = queryset.filter(matches).values('id', *FALLBACK_WEIGHTS)[:FALLBACK_CANDIDATE_LIMIT]
+    
+    ranked = []
+    for row in candidates:
+        rank = 0.0
+        for field, weight in FALLBACK_WEIGHTS.items():
+            words = re.findall(r'\w+', (row[field] or '').lower())
+            rank += weight * sum(1 for word in words for term in terms if word.startswith(term))
+        ranked.append((rank, row['id']))
+    ranked.sort(reverse=True)
+    return [product_id for rank, product_id in ranked[:limit]]
@@ -1,11 +1,70 @@
+import hashlib
+
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from django.db.models import Avg
-from .models import Product, Category, ProductImage, Review
+from caching import FragmentCache
+from .models import Product, ProductCard, Category, ProductImage, Review
+
+def _split_param(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+def select_fields(field_names, expandable_fields, query_params, path=''):
+    """
+    Pick the fields to render at `path` from the ?fields= and ?expand= query parameters.
+    Names are dotted paths from the top-level serializer (e.g. items.product_details.name);
+    when no field is requested at this level every non-expandable field is kept.
+    """
+    prefix = f'{path}.' if path else ''
+    requested = {name[len(prefix):].split('.')[0] for name in _split_param(query_params.get('fields')) if name.startswith(prefix)}
+    expanded = {name[len(prefix):].split('.')[0] for name in _split_param(query_params.get('expand')) if name.startswith(prefix)}
+    
+    selected = [name for name in field_names if name not in expandable_fields or name in expanded or name in requested]
+    if requested:
+        selected = [name for name in selected if name in requested]
+    return selected
+
+class DynamicFieldsMixin:
+    """
+    Support sparse fieldsets (?fields=) and opt-in expansion (?expand=) on read serializers.
+    Fields listed in Meta.expandable_fields are only rendered when asked for.
+    """
+    
+    @classmethod
+    def get_selected_fields(cls, request, path=''):
+        """The field names this serializer will render for a request, used to plan querysets"""
+        query_params = request.query_params if request is not None else {}
+        return select_fields(cls.Meta.fields, getattr(cls.Meta, 'expandable_fields', []), query_params, path)
+    
+    def get_field_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        # Never drop fields from a serializer that is validating input
+        if hasattr(self.root, 'initial_data'):
+            return fields
+        
+        request = self.context.get('request')
+        query_params = request.query_params if request is not None else {}
+        selected = select_fields(fields.keys(), getattr(self.Meta, 'expandable_fields', []), query_params, self.get_field_path())
+        return {name: fields[name] for name in selected}
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'parent']
+    
+    def validate_parent(self, value):
+        """Prevent moving a category under itself or one of its descendants"""
+        if value and self.instance and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError('A category cannot be moved under itself or one of its subcategories.')
+        return value
 
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
@@ -43,10 +102,11 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_username', 'rating', 'comment', 'created_at']
         read_only_fields = ['user', 'created_at']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
-    reviews = ReviewSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
+    primary_image = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(source='rating_average', read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     seller_username = serializers.CharField(source='seller.username', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     
@@ -55,13 +115,77 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'price', 'discount_price', 
             'stock', 'category', 'category_name', 'seller', 'seller_username', 
-            'created_at', 'updated_at', 'images', 'reviews', 'average_rating'
+            'created_at', 'updated_at', 'primary_image', 'images', 'average_rating',
+            'rating_count', 'rating_histogram'
+        ]
+        read_only_fields = ['seller', 'created_at', 'updated_at', 'rating_count']
+        # Only rendered when requested with ?expand= or ?fields=
+        expandable_fields = ['images']
+    
+    @classmethod
+    def load_fragments(cls, products, request, path=''):
+        """
+        Cached representations of `products` as rendered at `path`, fetched in one get_many.
+        Pass the result as the 'product_fragments' serializer context so only the misses are
+        serialized, then call save() on it. Images are prefetched for the misses only.
+        """
+        fields = cls.get_selected_fields(request, path)
+        # Image URLs are absolute, so the host is part of the representation
+        host = request.build_absolute_uri('/') if request is not None else ''
+        variant = hashlib.md5(repr((host, fields)).encode(), usedforsecurity=False).hexdigest()
+        
+        def key(product):
+            # updated_at also moves on review and image changes
+            parts = [product.pk, product.updated_at.timestamp()]
+            if 'category_name' in fields and product.category_id:
+                parts.append(product.category.updated_at.timestamp())
+            if 'seller_username' in fields:
+                # Renaming the seller doesn't touch the product
+                parts.append(product.seller.username)
+            return f"product:{variant}:{':'.join(map(str, parts))}"
+        
+        fragments = FragmentCache('product', {product.pk: key(product) for product in products})
+        missing = [product for product in products if product.pk in fragments.missing]
+        if missing and ('images' in fields or 'primary_image' in fields):
+            prefetch_related_objects(missing, Prefetch('images', queryset=ProductImage.objects.order_by('id')))
+        return fragments
+    
+    def to_representation(self, instance):
+        fragments = self.context.get('product_fragments')
+        if fragments is None:
+            return super().to_representation(instance)
+        return fragments.get(instance.pk, lambda: super(ProductSerializer, self).to_representation(instance))
+    
+    def get_primary_image(self, obj):
+        # Iterate the prefetched images rather than issuing a new query
+        images = list(obj.images.all())
+        if not images:
+            return None
+        image = min(images, key=lambda image: image.pk)
+        request = self.context.get('request')
+        if image.image and request:
+            return request.build_absolute_uri(image.image.url)
+        return None
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='product_id', read_only=True)
+    average_rating = serializers.FloatField(source='rating_average', read_only=True)
+    primary_image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ProductCard
+        fields = [
+            'id', 'name', 'effective_price', 'in_stock', 'primary_image', 'average_rating',
+            'rating_count', 'category_path', 'seller', 'seller_username', 'view_count', 'created_at'
         ]
-        read_only_fields = ['seller', 'created_at', 'updated_at']
     
-    def get_average_rating(self, obj):
-        avg = obj.reviews.aggregate(avg_rating=Avg('rating'))
-        return avg['avg_rating'] or 0
+    def get_primary_image(self, obj):
+        request = self.context.get('request')
+        if obj.primary_image and request:
+            return request.build_absolute_uri(ProductImage._meta.get_field('image').storage.url(obj.primary_image))
+        return None
+
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,100 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from caching import bump_version
+from . import autocomplete
+from .models import Category, Product, ProductCard, ProductImage, ProductSearchDocument, Review
+
+@receiver(post_save, sender=Review)
+def update_rating_stats_on_save(sender, instance, created, **kwargs):
+    if created:
+        Product.adjust_rating_stats(instance.product_id, instance.rating, 1)
+    else:
+        # The rating may have been edited, so recompute from scratch
+        Product.refresh_rating_stats(instance.product_id)
+
+@receiver(post_delete, sender=Review)
+def update_rating_stats_on_delete(sender, instance, **kwargs):
+    Product.adjust_rating_stats(instance.product_id, instance.rating, -1)
+
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def bump_cache_version(sender, **kwargs):
+    # Cached catalog responses are keyed by these versions
+    bump_version(sender._meta.model_name)
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def touch_product_on_image_change(sender, instance, **kwargs):
+    # Images are part of the product representation, so they move its ETag / Last-Modified
+    Product.touch(instance.product_id)
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_category_tree(sender, **kwargs):
+    # The cached tree holds the categories and their product counts
+    Category.invalidate_tree()
+
+@receiver(post_save, sender=Product)
+def refresh_search_document(sender, instance, **kwargs):
+    ProductSearchDocument.refresh([instance.pk])
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_documents(sender, instance, created, **kwargs):
+    # Product documents include the category name
+    if not created:
+        ProductSearchDocument.refresh(instance.products.values_list('id', flat=True))
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_product(sender, instance, **kwargs):
+    autocomplete.update_item('product', instance.pk, instance.name, instance.view_count)
+
+@receiver(post_save, sender=Category)
+def update_autocomplete_category(sender, instance, **kwargs):
+    autocomplete.update_item('category', instance.pk, instance.name)
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def remove_autocomplete_item(sender, instance, **kwargs):
+    autocomplete.remove_item('product' if sender is Product else 'category', instance.pk)
+
+# Products being deleted in this thread. A delete removes the product's reviews and images
+# (and its card) before the product row itself, and refreshing the card from their signals
+# would insert it again for a product that is about to go.
+_deleting = threading.local()
+
+def _deleting_products():
+    if not hasattr(_deleting, 'product_ids'):
+        _deleting.product_ids = set()
+    return _deleting.product_ids
+
+@receiver(pre_delete, sender=Product)
+def mark_product_deleting(sender, instance, **kwargs):
+    _deleting_products().add(instance.pk)
+
+@receiver(post_delete, sender=Product)
+def unmark_product_deleting(sender, instance, **kwargs):
+    _deleting_products().discard(instance.pk)
+
+# Registered after the rating and touch receivers above, so the card sees their updates.
+# Category moves are applied to the cards by Category.save().
+@receiver(post_save, sender=Product)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=ProductImage)
+def refresh_product_card(sender, instance, **kwargs):
+    product_id = instance.pk if sender is Product else instance.product_id
+    if product_id not in _deleting_products():
+        ProductCard.refresh([product_id])
+
+@receiver(post_save, sender=get_user_model())
+def update_card_seller_username(sender, instance, **kwargs):
+    renamed = ProductCard.objects.filter(seller_id=instance.pk).exclude(seller_username=instance.username).update(
+        seller_username=instance.username
+    )
+    if renamed:
+        # Cached product responses render seller_username
+        bump_version('product')
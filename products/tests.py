@@ -1,11 +1,46 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Category, Product
+from analytics.models import UserActivity
+from middleware import VISITOR_COOKIE_SALT
+from caching import LocalLRUCache, TieredCache, get_or_compute, response_cache_stats, tiered_cache
+from . import autocomplete
+from .tracking import DedupeWindow, ViewBuffer, view_buffer
+from .models import Category, Product, ProductCard, ProductImage, ProductView, Review
 
 User = get_user_model()
 
+def decode_columnar(payload):
+    """Client-side decoding of a ?format=columnar list back into one dict per item"""
+    dictionaries = payload['dictionaries']
+    items = []
+    for row in payload['rows']:
+        item = {}
+        for column, value in zip(payload['columns'], row):
+            if column in dictionaries and value is not None:
+                value = dictionaries[column][value]
+            item[column] = value
+        items.append(item)
+    return items
+
 class ProductTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -27,3 +62,887 @@ class ProductTests(TestCase):
         self.assertEqual(Product.objects.count(), 1)
         self.assertEqual(Product.objects.get().name, 'Test Product')
 
+
+class ProductQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.category = Category.objects.create(name='Test Category')
+        for i in range(5):
+            product = Product.objects.create(
+                name=f'Product {i}', description='Description', price='9.99',
+                stock=10, category=self.category, seller=self.seller
+            )
+            ProductImage.objects.create(product=product, image=f'products/image{i}.jpg')
+            reviewer = User.objects.create_user(f'reviewer{i}', f'reviewer{i}@test.com', 'password123')
+            Review.objects.create(product=product, user=reviewer, rating=4, comment='Good')
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        # Page ETag, products, images
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/', {'expand': 'images'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['results'][0]['average_rating'], 4)
+        self.assertEqual(response.data['results'][0]['rating_count'], 1)
+        self.assertEqual(len(response.data['results'][0]['images']), 1)
+
+    def test_sparse_fieldset_skips_unneeded_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/', {'fields': 'id,name,price'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price'})
+        
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/', {'fields': 'id,name,price,primary_image'})
+        product = response.data['results'][0]
+        self.assertEqual(set(product), {'id', 'name', 'price', 'primary_image'})
+        self.assertTrue(product['primary_image'].endswith('/media/products/image4.jpg'))
+
+    def test_expandable_fields_are_opt_in(self):
+        response = self.client.get('/api/products/')
+        product = response.data['results'][0]
+        self.assertNotIn('images', product)
+        self.assertNotIn('reviews', product)
+        self.assertIn('primary_image', product)
+
+    def test_reviews_endpoint_is_paginated_and_filtered(self):
+        product = Product.objects.get(name='Product 0')
+        for i, rating in enumerate([5, 1, 5]):
+            reviewer = User.objects.create_user(f'extra{i}', f'extra{i}@test.com', 'password123')
+            Review.objects.create(product=product, user=reviewer, rating=rating, comment=f'Review {i}')
+        url = f'/api/products/{product.id}/reviews/'
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'page_size': 2})
+        self.assertEqual([review['comment'] for review in response.data['results']], ['Review 2', 'Review 1'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([review['comment'] for review in response.data['results']], ['Review 0', 'Good'])
+        
+        response = self.client.get(url, {'rating': 5, 'ordering': 'oldest'})
+        self.assertEqual([review['comment'] for review in response.data['results']], ['Review 0', 'Review 2'])
+        
+        response = self.client.get(url, {'ordering': 'random'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_category_products_query_count(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/products/categories/{self.category.id}/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_list_is_cursor_paginated(self):
+        response = self.client.get('/api/products/', {'page_size': 2})
+        first_page = [product['name'] for product in response.data['results']]
+        self.assertEqual(first_page, ['Product 4', 'Product 3'])
+        self.assertIsNone(response.data['previous'])
+        
+        # Rows inserted after the first page was fetched don't shift the next page
+        Product.objects.create(
+            name='Newest', description='Description', price='1.00',
+            stock=1, category=self.category, seller=self.seller
+        )
+        response = self.client.get(response.data['next'])
+        self.assertEqual([product['name'] for product in response.data['results']], ['Product 2', 'Product 1'])
+
+    def test_sorts_page_through_more_than_a_thousand_tied_rows(self):
+        Product.objects.bulk_create([
+            Product(name=f'Tied {i}', description='d', price='9.00', stock=1, category=self.category, seller=self.seller)
+            for i in range(1250)
+        ])
+        ProductCard.refresh(Product.objects.values_list('id', flat=True))
+        expected = set(Product.objects.values_list('id', flat=True))
+        for url, sort in [('/api/products/', 'price'), ('/api/products/', 'rating'), ('/api/products/cards/', 'popularity')]:
+            seen = []
+            response = self.client.get(url, {'sort': sort, 'page_size': 100})
+            while True:
+                seen.extend(product['id'] for product in response.data['results'])
+                if not response.data['next']:
+                    break
+                last_page = response
+                response = self.client.get(response.data['next'])
+            self.assertEqual(len(seen), len(expected), sort)
+            self.assertEqual(set(seen), expected, sort)
+            # Stepping back returns the page before the last one
+            previous = self.client.get(response.data['previous'])
+            self.assertEqual(previous.data['results'], last_page.data['results'], sort)
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/products/', {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class ProductRatingStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user('customer', 'customer@test.com', 'password123')
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Test Category')
+        self.product = Product.objects.create(
+            name='Product', description='Description', price='9.99',
+            stock=10, category=category, seller=seller
+        )
+        other = User.objects.create_user('other', 'other@test.com', 'password123')
+        Review.objects.create(product=self.product, user=other, rating=2, comment='Meh')
+
+    def test_add_review_updates_stats(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(f'/api/products/{self.product.id}/add-review/', {'rating': 5, 'comment': 'Great'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_sum, 7)
+        self.assertEqual(self.product.rating_average, 3.5)
+        self.assertEqual(self.product.rating_histogram, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+
+    def test_deleting_review_updates_stats(self):
+        Review.objects.filter(product=self.product).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 0)
+        self.assertEqual(self.product.rating_average, 0)
+        self.assertEqual(self.product.rating_2_count, 0)
+
+    def test_backfill_command(self):
+        Product.objects.filter(pk=self.product.pk).update(**Product.empty_rating_stats())
+        etag = self.client.get(f'/api/products/{self.product.pk}/')['ETag']
+        call_command('backfill_product_ratings', stdout=StringIO())
+        response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.data['average_rating'], 2)
+        self.assertEqual(ProductCard.objects.get(pk=self.product.pk).rating_average, 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.rating_average, 2)
+        self.assertEqual(self.product.rating_2_count, 1)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.root = Category.objects.create(name='Root')
+        self.child = Category.objects.create(name='Child', parent=self.root)
+        self.grandchild = Category.objects.create(name='Grandchild', parent=self.child)
+        self.other = Category.objects.create(name='Other')
+        for category in [self.root, self.grandchild, self.grandchild]:
+            Product.objects.create(
+                name=f'In {category.name}', description='Description', price='1.00',
+                stock=1, category=category, seller=seller
+            )
+
+    def test_path_is_maintained_on_move(self):
+        self.assertTrue(self.grandchild.path.startswith(self.root.path))
+        self.assertEqual(self.grandchild.depth, 2)
+        
+        self.child.parent = self.other
+        self.child.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.path, f'{self.other.path}{self.child.pk:010d}/{self.grandchild.pk:010d}/')
+        self.assertEqual(list(self.root.get_descendants()), [])
+
+    def test_subtree_products_in_single_query(self):
+        url = f'/api/products/categories/{self.root.id}/products/'
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'include_descendants': 'true'})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_tree_is_cached_and_invalidated(self):
+        response = self.client.get('/api/products/categories/tree/')
+        root = next(node for node in response.data if node['name'] == 'Root')
+        self.assertEqual(root['product_count'], 1)
+        self.assertEqual(root['subtree_product_count'], 3)
+        self.assertEqual(root['children'][0]['children'][0]['name'], 'Grandchild')
+        
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/categories/tree/')
+        
+        Category.objects.create(name='New', parent=self.other)
+        response = self.client.get('/api/products/categories/tree/')
+        other = next(node for node in response.data if node['name'] == 'Other')
+        self.assertEqual(other['children'][0]['name'], 'New')
+
+    def test_cannot_move_category_under_descendant(self):
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'password123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.patch(f'/api/products/categories/{self.root.id}/', {'parent': self.grandchild.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        shoes = Category.objects.create(name='Shoes')
+        hats = Category.objects.create(name='Hats')
+        Product.objects.create(name='Trail runner', description='Light running shoe', price='50.00', stock=1, category=shoes, seller=seller)
+        Product.objects.create(name='Running shoe', description='Road running shoe for running daily', price='60.00', stock=1, category=shoes, seller=seller)
+        Product.objects.create(name='Sun hat', description='Wide brim', price='20.00', stock=1, category=hats, seller=seller)
+
+    def test_search_ranks_name_matches_first_and_logs_query(self):
+        response = self.client.get('/api/products/search/', {'q': 'running shoe'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([product['name'] for product in response.data['results']], ['Running shoe', 'Trail runner'])
+        self.assertTrue(UserActivity.objects.filter(activity_type='search', search_query='running shoe').exists())
+
+    def test_search_matches_category_name(self):
+        response = self.client.get('/api/products/search/', {'q': 'hats'})
+        self.assertEqual([product['name'] for product in response.data['results']], ['Sun hat'])
+
+    def test_search_requires_query(self):
+        response = self.client.get('/api/products/search/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_rejects_bad_limit(self):
+        for limit in ['-1', '0', 'ten']:
+            response = self.client.get('/api/products/search/', {'q': 'shoe', 'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductCatalogFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        other_seller = User.objects.create_user('other', 'other@test.com', 'password123', role='seller')
+        self.clothing = Category.objects.create(name='Clothing')
+        self.shirts = Category.objects.create(name='Shirts', parent=self.clothing)
+        toys = Category.objects.create(name='Toys')
+        self.cheap = Product.objects.create(name='Cheap shirt', description='d', price='30.00', discount_price='20.00', stock=5, category=self.shirts, seller=self.seller)
+        self.pricey = Product.objects.create(name='Pricey coat', description='d', price='300.00', stock=0, category=self.clothing, seller=self.seller)
+        self.toy = Product.objects.create(name='Toy', description='d', price='60.00', stock=3, category=toys, seller=other_seller, view_count=10)
+        Product.objects.filter(pk=self.pricey.pk).update(rating_average=4.5, rating_count=2)
+
+    def names(self, response):
+        return [product['name'] for product in response.data['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.names(self.client.get('/api/products/', {'category': self.clothing.id})), ['Pricey coat', 'Cheap shirt'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'max_price': '25'})), ['Cheap shirt'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'min_price': '50', 'in_stock': 'true'})), ['Toy'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'seller': self.seller.id, 'min_rating': 4})), ['Pricey coat'])
+        response = self.client.get('/api/products/', {'min_price': 'cheap'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sorting_paginates_on_the_sort_key(self):
+        response = self.client.get('/api/products/', {'sort': 'price', 'page_size': 2})
+        self.assertEqual(self.names(response), ['Cheap shirt', 'Toy'])
+        self.assertEqual(self.names(self.client.get(response.data['next'])), ['Pricey coat'])
+        self.assertEqual(self.names(self.client.get('/api/products/', {'sort': 'popularity'}))[0], 'Toy')
+        self.assertEqual(self.names(self.client.get('/api/products/', {'sort': 'rating'}))[0], 'Pricey coat')
+
+    def test_facet_counts(self):
+        # One page of products, then the grouped category counts and the bucket counts
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/', {'facets': 'true', 'fields': 'id'})
+        facets = response.data['facets']
+        self.assertEqual({row['name']: row['count'] for row in facets['categories']}, {'Shirts': 1, 'Clothing': 1, 'Toys': 1})
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [1, 0, 1, 0, 1, 0])
+        self.assertEqual(facets['rating'][0], {'min_rating': 4, 'count': 1})
+
+
+class ProductAutocompleteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        autocomplete.reset_index()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.shoes = Category.objects.create(name='Shoes')
+        Product.objects.create(name='Running shoe', description='d', price='1.00', stock=1, category=self.shoes, seller=seller, view_count=5)
+        Product.objects.create(name='Shoe polish', description='d', price='1.00', stock=1, category=self.shoes, seller=seller, view_count=50)
+
+    def tearDown(self):
+        autocomplete.reset_index()
+
+    def test_prefix_lookup_is_weighted_and_served_from_memory(self):
+        response = self.client.get('/api/products/autocomplete/', {'q': 'sho'})
+        self.assertEqual([item['name'] for item in response.data['suggestions']], ['Shoe polish', 'Running shoe', 'Shoes'])
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/autocomplete/', {'q': 'run'})
+        self.assertEqual([item['name'] for item in response.data['suggestions']], ['Running shoe'])
+
+    def test_limit_must_be_positive(self):
+        for limit in ['-1', '0', 'ten']:
+            response = self.client.get('/api/products/autocomplete/', {'q': 'sho', 'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_product_changes(self):
+        self.client.get('/api/products/autocomplete/', {'q': 'x'})
+        product = Product.objects.get(name='Running shoe')
+        product.name = 'Trail runner'
+        product.save()
+        names = [item['name'] for item in self.client.get('/api/products/autocomplete/', {'q': 'tra'}).data['suggestions']]
+        self.assertEqual(names, ['Trail runner'])
+        product.delete()
+        self.assertEqual(self.client.get('/api/products/autocomplete/', {'q': 'tra'}).data['suggestions'], [])
+
+    def test_memory_cap_keeps_most_popular(self):
+        index = autocomplete.PrefixIndex(max_items=2)
+        index.add('product', 1, 'Apple', 1)
+        index.add('product', 2, 'Apricot', 5)
+        index.add('product', 3, 'Avocado', 3)
+        self.assertEqual(len(index), 2)
+        self.assertEqual([item['name'] for item in index.lookup('a')], ['Apricot', 'Avocado'])
+        # Evictions follow weight changes
+        index.add('product', 2, 'Apricot', 0)
+        index.add('product', 4, 'Almond', 2)
+        self.assertEqual([item['name'] for item in index.lookup('a')], ['Avocado', 'Almond'])
+
+    def test_expired_index_is_served_while_it_is_rebuilt_in_the_background(self):
+        index = autocomplete.get_index()
+        fresh = autocomplete.PrefixIndex.from_items([('product', 1, 'Sandal', 1)], 10)
+        built = threading.Event()
+        
+        def slow_build():
+            built.wait(5)
+            return fresh
+        
+        with mock.patch.object(autocomplete, '_built_at', -1e9), mock.patch.object(autocomplete, 'build_index', slow_build):
+            with self.assertNumQueries(0):
+                self.assertIs(autocomplete.get_index(), index)
+                self.assertIs(autocomplete.get_index(), index)
+            built.set()
+            # The rebuild thread releases the lock once the new index is in place
+            with autocomplete._build_lock:
+                self.assertIs(autocomplete.get_index(), fresh)
+    
+    def test_bulk_build_matches_incremental_adds(self):
+        items = [('product', i, f'Item {i} {"red" if i % 2 else "blue"}', i % 7) for i in range(50)]
+        built = autocomplete.PrefixIndex.from_items(items, max_items=30)
+        added = autocomplete.PrefixIndex(max_items=30)
+        for item in sorted(items, key=lambda item: -item[3]):
+            added.add(*item)
+        self.assertEqual(built.entries, added.entries)
+        self.assertEqual(built.lookup('red', 5), added.lookup('red', 5))
+
+
+# Both paths must actually render, not be answered from the response cache
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)
+class FastListSerializationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Shoes')
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Shoe {i}', description='Description', price='49.90',
+                discount_price='39.90' if i == 1 else None, stock=i, category=category, seller=seller
+            )
+            for n in range(i):
+                ProductImage.objects.create(product=product, image=f'products/shoe{i}-{n}.jpg')
+            reviewer = User.objects.create_user(f'reviewer{i}', f'reviewer{i}@test.com', 'password123')
+            Review.objects.create(product=product, user=reviewer, rating=i + 3, comment='Good')
+
+    def get_both(self, params):
+        with override_settings(FAST_LIST_SERIALIZATION=False):
+            expected = self.client.get('/api/products/', params)
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            actual = self.client.get('/api/products/', params)
+        return expected, actual
+
+    def test_output_is_byte_identical(self):
+        for params in [{}, {'expand': 'images'}, {'fields': 'id,name,primary_image'}, {'sort': 'price', 'page_size': 2}]:
+            expected, actual = self.get_both(params)
+            self.assertEqual(actual.status_code, status.HTTP_200_OK)
+            self.assertEqual(actual.content, expected.content, params)
+
+    def test_cursor_from_fast_path_continues_the_listing(self):
+        _, actual = self.get_both({'sort': 'price', 'page_size': 2, 'fields': 'name'})
+        with override_settings(FAST_LIST_SERIALIZATION=True):
+            next_page = self.client.get(actual.data['next'])
+        self.assertEqual(next_page.data['results'], [{'name': 'Shoe 2'}])
+
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.category = Category.objects.create(name='Lamps')
+        self.product = Product.objects.create(
+            name='Desk lamp', description='Description', price='25.00', stock=3, category=self.category, seller=seller
+        )
+        self.url = f'/api/products/{self.product.id}/'
+
+    def test_retrieve_returns_304_for_current_etag(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertIn('Last-Modified', response)
+        
+        # The product and its images are never loaded, only the validators (and the view is tracked)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse([query for query in queries if 'products_productimage' in query['sql']])
+        self.assertEqual(response.content, b'')
+        
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_reviews_images_category_and_seller_changes_move_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        reviewer = User.objects.create_user('reviewer', 'reviewer@test.com', 'password123')
+        changes = [
+            lambda: Review.objects.create(product=self.product, user=reviewer, rating=5, comment='Bright'),
+            lambda: ProductImage.objects.create(product=self.product, image='products/lamp.jpg'),
+            lambda: Category.objects.get(pk=self.category.pk).save(),
+            self.rename_seller,
+        ]
+        for change in changes:
+            change()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+    def rename_seller(self):
+        seller = self.product.seller
+        seller.username = 'lighting'
+        seller.save()
+
+    def test_hidden_products_are_not_validated(self):
+        etag = self.client.get(self.url)['ETag']
+        # Sellers only see their own products, so another seller's copy isn't confirmed
+        other = User.objects.create_user('other', 'other@test.com', 'password123', role='seller')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_pages_are_validated(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn('Last-Modified', response)
+        
+        self.product.delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_category_tree_has_strong_etag(self):
+        Category.invalidate_tree()
+        response = self.client.get('/api/products/categories/tree/')
+        self.assertFalse(response['ETag'].startswith('W/'))
+        response = self.client.get('/api/products/categories/tree/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        tiered_cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.category = Category.objects.create(name='Mugs')
+        self.product = Product.objects.create(
+            name='Blue mug', description='Description', price='8.00', stock=3, category=self.category, seller=self.seller
+        )
+
+    def names(self, response):
+        return [product['name'] for product in response.data['results']]
+
+    def test_anonymous_reads_are_served_from_cache_until_a_write(self):
+        first = self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/products/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        
+        self.product.name = 'Red mug'
+        self.product.save()
+        self.assertEqual(self.names(self.client.get('/api/products/')), ['Red mug'])
+        
+        reviewer = User.objects.create_user('reviewer', 'reviewer@test.com', 'password123')
+        Review.objects.create(product=self.product, user=reviewer, rating=2, comment='Chipped')
+        self.assertEqual(self.client.get(f'/api/products/{self.product.id}/').data['rating_count'], 1)
+
+    def test_raw_sql_deletes_invalidate(self):
+        self.assertEqual(self.names(self.client.get('/api/products/')), ['Blue mug'])
+        self.client.get(f'/api/products/categories/{self.category.id}/')
+        
+        self.client.force_authenticate(user=self.seller)
+        self.assertEqual(self.client.delete(f'/api/products/{self.product.id}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(f'/api/products/categories/{self.category.id}/').status_code, status.HTTP_204_NO_CONTENT)
+        
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.names(self.client.get('/api/products/')), [])
+        self.assertEqual(self.client.get(f'/api/products/categories/{self.category.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_hit_still_tracks_the_view(self):
+        view_buffer.events.clear()
+        view_buffer.dedupe.clear()
+        url = f'/api/products/{self.product.id}/'
+        # Two visitors, since repeat views by one visitor are deduplicated
+        APIClient().get(url, REMOTE_ADDR='10.0.0.1')
+        APIClient().get(url, REMOTE_ADDR='10.0.0.2')
+        view_buffer.flush()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.view_count, 2)
+
+    def test_hit_and_miss_statistics(self):
+        for _ in range(3):
+            self.client.get('/api/products/categories/')
+        admin = User.objects.create_user('admin', 'admin@test.com', 'password123', role='admin')
+        self.client.force_authenticate(user=admin)
+        stats = self.client.get('/api/analytics/cache/').data['endpoints']['CategoryViewSet.list']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+
+class ProductFragmentCacheTests(TestCase):
+    def setUp(self):
+        tiered_cache.clear()
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        # Authenticated requests skip the response cache, so only fragments are reused
+        self.client.force_authenticate(user=seller)
+        category = Category.objects.create(name='Plants')
+        self.products = [
+            Product.objects.create(name=f'Fern {i}', description='Description', price='15.00', stock=2, category=category, seller=seller)
+            for i in range(3)
+        ]
+        for product in self.products:
+            ProductImage.objects.create(product=product, image=f'products/fern{product.pk}.jpg')
+
+    def test_cached_fragments_skip_serialization_and_image_queries(self):
+        # Page ETag, products, images
+        with self.assertNumQueries(3):
+            first = self.client.get('/api/products/', {'expand': 'images'})
+        with self.assertNumQueries(2):
+            second = self.client.get('/api/products/', {'expand': 'images'})
+        self.assertEqual(second.content, first.content)
+        # Another field selection is cached separately
+        self.assertNotIn('images', self.client.get('/api/products/').data['results'][0])
+
+    def test_only_changed_products_are_reserialized(self):
+        self.client.get('/api/products/')
+        self.products[1].name = 'Tall fern'
+        self.products[1].save()
+        response = self.client.get('/api/products/')
+        self.assertEqual([product['name'] for product in response.data['results']], ['Fern 2', 'Tall fern', 'Fern 0'])
+        
+        stats = response_cache_stats()['fragments:product']
+        self.assertEqual((stats['hits'], stats['misses']), (2, 4))
+    
+    def test_renaming_the_seller_refreshes_the_fragments(self):
+        self.client.get('/api/products/')
+        seller = self.products[0].seller
+        seller.username = 'greenhouse'
+        seller.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual({product['seller_username'] for product in response.data['results']}, {'greenhouse'})
+
+
+class CategoryQueryCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        # Authenticated, so the response cache doesn't answer first
+        self.client.force_authenticate(user=self.seller)
+        Category.objects.create(name='Garden')
+
+    def test_list_is_cached_until_the_table_changes(self):
+        self.client.get('/api/products/categories/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/categories/')
+        self.assertEqual([category['name'] for category in response.data['results']], ['Garden'])
+        
+        Category.objects.create(name='Kitchen')
+        response = self.client.get('/api/products/categories/')
+        self.assertEqual([category['name'] for category in response.data['results']], ['Garden', 'Kitchen'])
+        
+        Category.objects.filter(name='Kitchen').update(name='Cooking')
+        response = self.client.get('/api/products/categories/')
+        self.assertEqual(response.data['results'][1]['name'], 'Cooking')
+
+
+class TieredCacheTests(TestCase):
+    def test_local_tier_is_bounded_and_expires(self):
+        local = LocalLRUCache(max_entries=2, ttl=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertEqual((local.get('a'), local.get('b'), local.get('c')), (1, None, 3))
+        
+        local.set('d', {'name': 'Lamp'}, timeout=0)
+        self.assertIsNone(local.get('d'))
+        
+        # Values are copies, never shared between callers
+        local.set('e', {'name': 'Lamp'})
+        local.get('e')['name'] = 'Changed'
+        self.assertEqual(local.get('e'), {'name': 'Lamp'})
+
+    def test_reads_are_served_from_worker_memory(self):
+        shared = LocMemCache('tiered-test', {})
+        tiered = TieredCache(shared, LocalLRUCache(max_entries=10, ttl=60))
+        tiered.set('key', 'value')
+        shared.clear()
+        self.assertEqual(tiered.get('key'), 'value')
+        
+        shared.set('other', 'shared value')
+        self.assertEqual(tiered.get_many(['key', 'other']), {'key': 'value', 'other': 'shared value'})
+
+    def test_invalidation_reaches_other_workers_through_versions(self):
+        Category.objects.create(name='Tools')
+        self.assertEqual(len(Category.get_tree()), 1)
+        # Invalidation only moves the shared version on: the old tree stays in this worker's
+        # memory tier (as it would in every other worker) but is no longer addressed
+        entries = len(tiered_cache.local.entries)
+        Category.objects.create(name='Paint')
+        self.assertEqual(len(Category.get_tree()), 2)
+        self.assertEqual(len(tiered_cache.local.entries), entries + 1)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        tiered_cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'rendered'
+        
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            results = list(pool.map(lambda _: get_or_compute('single-flight-test', compute, 60), range(5)))
+        self.assertEqual(results, ['rendered'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_entries_are_refreshed_early_near_expiry(self):
+        get_or_compute('early-refresh-test', lambda: 'old', 60)
+        self.assertEqual(get_or_compute('early-refresh-test', lambda: 'new', 60), 'old')
+        # A draw close to 1 (and a large beta) pushes the estimated time past expiry
+        with mock.patch('caching.random.random', return_value=0.999999):
+            self.assertEqual(get_or_compute('early-refresh-test', lambda: 'new', 60, beta=1e12), 'new')
+
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        tiered_cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.reviewer = User.objects.create_user('reviewer', 'reviewer@test.com', 'password123')
+        self.clothing = Category.objects.create(name='Clothing')
+        self.shirts = Category.objects.create(name='Shirts', parent=self.clothing)
+        self.toys = Category.objects.create(name='Toys')
+        self.shirt = Product.objects.create(name='Shirt', description='d', price='30.00', discount_price='20.00', stock=5, category=self.shirts, seller=self.seller)
+        self.toy = Product.objects.create(name='Toy', description='d', price='60.00', stock=0, category=self.toys, seller=self.seller)
+        self.shirt_id = self.shirt.pk
+
+    def names(self, response):
+        return [card['name'] for card in response.data['results']]
+
+    def test_cards_follow_writes_to_the_source_tables(self):
+        card = ProductCard.objects.get(pk=self.shirt.pk)
+        self.assertEqual((str(card.effective_price), card.in_stock, card.category_path), ('20.00', True, self.shirts.path))
+        
+        Review.objects.create(product=self.shirt, user=self.reviewer, rating=4)
+        ProductImage.objects.create(product=self.shirt, image='products/shirt.jpg')
+        self.seller.username = 'renamed'
+        self.seller.save()
+        self.shirts.parent = self.toys
+        self.shirts.save()
+        
+        card.refresh_from_db()
+        self.assertEqual((card.rating_average, card.rating_count), (4.0, 1))
+        self.assertEqual(card.primary_image, 'products/shirt.jpg')
+        self.assertEqual(card.seller_username, 'renamed')
+        self.assertEqual(card.category_path, Category.objects.get(pk=self.shirts.pk).path)
+
+    def test_listing_filters_and_sorts_on_the_card_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/cards/', {'category': self.toys.id})
+        self.assertEqual(self.names(response), ['Toy'])
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+        
+        self.assertEqual(self.names(self.client.get('/api/products/cards/', {'sort': '-price'})), ['Toy', 'Shirt'])
+        self.assertEqual(self.names(self.client.get('/api/products/cards/', {'in_stock': 'true'})), ['Shirt'])
+
+    def test_deleting_a_product_cascades_without_recreating_its_card(self):
+        Review.objects.create(product=self.shirt, user=self.reviewer, rating=4)
+        ProductImage.objects.create(product=self.shirt, image='products/shirt.jpg')
+        self.shirt.delete()
+        # The reviews and images go first; their signals must not insert the card again
+        connection.check_constraints()
+        self.assertFalse(ProductCard.objects.filter(pk=self.shirt_id).exists())
+        
+        Review.objects.create(product=self.toy, user=self.reviewer, rating=2)
+        self.seller.delete()
+        connection.check_constraints()
+        self.assertFalse(ProductCard.objects.exists())
+
+    def test_rebuild_command(self):
+        ProductCard.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_product_cards', stdout=out)
+        self.assertIn('Rebuilt 2 product cards', out.getvalue())
+        self.assertEqual(ProductCard.objects.get(pk=self.toy.pk).name, 'Toy')
+
+
+class WarmCachesTests(TransactionTestCase):
+    # The warm-up runs on a thread pool, whose connections can't see a TestCase's transaction
+    def setUp(self):
+        tiered_cache.clear()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        self.category = Category.objects.create(name='Shoes')
+        self.product = Product.objects.create(name='Shoe', description='d', price='10.00', category=self.category, seller=seller)
+        ProductView.objects.create(product=self.product, session_id='visitor')
+
+    def test_command_warms_each_key_and_reports_timings(self):
+        out = StringIO()
+        call_command('warm_caches', workers=2, host='testserver', stdout=out)
+        output = out.getvalue()
+        for key in ['category-tree', 'schema', f'product:{self.product.id}', f'category:{self.category.id}']:
+            self.assertRegex(output, rf'{key}: [\d.]+ ms')
+        self.assertIn('Warmed 4 of 4 keys', output)
+        # Warm-up requests aren't product views
+        self.assertEqual(ProductView.objects.count(), 1)
+        
+        # A visitor now gets the warmed response
+        self.client.get(f'/api/products/{self.product.id}/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response_cache_stats()['ProductViewSet.retrieve']['hits'], 1)
+
+
+class ColumnarFormatTests(TestCase):
+    def setUp(self):
+        tiered_cache.clear()
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Garden')
+        for i in range(4):
+            Product.objects.create(name=f'Rake {i}', description='d', price='10.00', category=category, seller=seller)
+
+    def test_columnar_list_decodes_to_the_json_list(self):
+        expected = self.client.get('/api/products/').json()
+        response = self.client.get('/api/products/', {'format': 'columnar'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.columnar+json')
+        payload = response.json()
+        self.assertEqual(payload['dictionaries']['category_name'], ['Garden'])
+        self.assertEqual(payload['dictionaries']['seller_username'], ['seller'])
+        self.assertEqual(decode_columnar(payload), expected['results'])
+        self.assertEqual(payload['next'], expected['next'])
+        self.assertLess(len(response.content), len(self.client.get('/api/products/').content))
+
+    def test_negotiated_through_accept(self):
+        response = self.client.get('/api/products/', HTTP_ACCEPT='application/vnd.columnar+json')
+        self.assertEqual(len(decode_columnar(response.json())), 4)
+
+
+class ViewBufferTests(TestCase):
+    def setUp(self):
+        # Views recorded by other tests would be written against reused product ids
+        view_buffer.events.clear()
+        view_buffer.dedupe.clear()
+        self.client = APIClient()
+        seller = User.objects.create_user('seller', 'seller@test.com', 'password123', role='seller')
+        category = Category.objects.create(name='Lamps')
+        self.lamp = Product.objects.create(name='Lamp', description='d', price='10.00', category=category, seller=seller)
+        self.shade = Product.objects.create(name='Shade', description='d', price='5.00', category=category, seller=seller)
+
+    def test_views_are_written_in_one_batch(self):
+        for visitor in range(3):
+            APIClient().get(f'/api/products/{self.lamp.id}/', REMOTE_ADDR=f'10.0.0.{visitor}')
+        APIClient().get(f'/api/products/{self.shade.id}/')
+        self.assertEqual(ProductView.objects.count(), 0)
+        
+        # Existence checks, one bulk insert and one counter UPDATE per distinct increment
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(view_buffer.flush(), 4)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(ProductView.objects.filter(product=self.lamp).count(), 3)
+        self.lamp.refresh_from_db()
+        self.assertEqual((self.lamp.view_count, ProductCard.objects.get(pk=self.lamp.pk).view_count), (3, 3))
+
+    def test_repeat_views_within_the_window_are_suppressed(self):
+        suppressed = view_buffer.stats()['suppressed']
+        for _ in range(3):
+            self.client.get(f'/api/products/{self.lamp.id}/')
+        self.client.get(f'/api/products/{self.shade.id}/')
+        self.assertEqual(view_buffer.flush(), 2)
+        self.assertEqual(view_buffer.stats()['suppressed'] - suppressed, 2)
+        
+        buffer = ViewBuffer(max_size=10, batch_size=10, flush_interval=60, dedupe=DedupeWindow(window=60, max_keys=100))
+        with mock.patch('products.tracking.time.time', return_value=1000.0):
+            self.assertEqual([buffer.record(self.lamp.id, user_id=1) for _ in range(2)], [True, False])
+        with mock.patch('products.tracking.time.time', return_value=1061.0):
+            self.assertTrue(buffer.record(self.lamp.id, user_id=1))
+    
+    def test_views_without_the_cookie_are_deduplicated_by_client(self):
+        url = f'/api/products/{self.lamp.id}/'
+        for _ in range(3):
+            APIClient().get(url, REMOTE_ADDR='10.0.0.1', HTTP_USER_AGENT='crawler')
+        APIClient().get(url, REMOTE_ADDR='10.0.0.1', HTTP_USER_AGENT='browser')
+        APIClient().get(url, REMOTE_ADDR='10.0.0.2', HTTP_USER_AGENT='crawler')
+        self.assertEqual(view_buffer.flush(), 3)
+    
+    def test_dropped_view_is_not_marked_as_seen(self):
+        buffer = ViewBuffer(max_size=1, batch_size=10, flush_interval=60, dedupe=DedupeWindow(window=60, max_keys=100))
+        buffer.record(self.shade.id, user_id=1)
+        self.assertFalse(buffer.record(self.lamp.id, user_id=1))
+        buffer.events.clear()
+        self.assertTrue(buffer.record(self.lamp.id, user_id=1))
+        self.assertEqual((buffer.stats()['dropped'], buffer.stats()['suppressed']), (1, 0))
+
+    def test_anonymous_views_use_a_signed_visitor_cookie_not_a_session(self):
+        self.client.get(f'/api/products/{self.lamp.id}/')
+        cookie = self.client.cookies[settings.VISITOR_COOKIE_NAME]
+        self.client.get(f'/api/products/{self.shade.id}/')
+        self.client.get('/api/products/search/', {'q': 'lamp'})
+        view_buffer.flush()
+        
+        self.assertEqual(Session.objects.count(), 0)
+        visitor_id = signing.get_cookie_signer(salt=settings.VISITOR_COOKIE_NAME + VISITOR_COOKIE_SALT).unsign(cookie.value)
+        self.assertEqual(set(ProductView.objects.values_list('session_id', flat=True)), {visitor_id})
+        self.assertEqual(UserActivity.objects.get().session_id, visitor_id)
+        # The cookie is issued once, and a tampered one is replaced
+        self.assertEqual(self.client.cookies[settings.VISITOR_COOKIE_NAME].value, cookie.value)
+        self.client.cookies[settings.VISITOR_COOKIE_NAME] = visitor_id
+        response = self.client.get(f'/api/products/{self.lamp.id}/')
+        self.assertNotEqual(response.cookies[settings.VISITOR_COOKIE_NAME].value, visitor_id)
+
+    def test_forked_worker_starts_its_own_flusher(self):
+        buffer = ViewBuffer(max_size=10, batch_size=10, flush_interval=60)
+        buffer.start()
+        buffer.record(self.lamp.id, session_id='parent')
+        # Wakes the parent's thread once stop() has set the flag it checks
+        self.addCleanup(buffer.wakeup.set)
+        # What os.fork() leaves in the child: the parent's events but not its thread
+        child_pid = os.getpid() + 1
+        buffer._after_fork()
+        with mock.patch('os.getpid', return_value=child_pid):
+            self.assertFalse(buffer.running)
+            buffer.record(self.shade.id, session_id='child')
+            self.assertTrue(buffer.running)
+            self.assertEqual((buffer.pid, [event[2] for event in buffer.events]), (child_pid, ['child']))
+            buffer.stop()
+
+    def test_full_buffer_drops_and_counts(self):
+        buffer = ViewBuffer(max_size=2, batch_size=10, flush_interval=60)
+        self.assertEqual([buffer.record(self.lamp.id, session_id='s') for _ in range(3)], [True, True, False])
+        self.assertEqual(buffer.stats()['dropped'], 1)
+
+    def test_spooled_events_are_replayed_after_a_crash(self):
+        spool_path = os.path.join(tempfile.mkdtemp(), 'views.log')
+        crashed = ViewBuffer(max_size=10, batch_size=10, flush_interval=60, spool_path=spool_path)
+        crashed.record(self.lamp.id, session_id='s')
+        crashed.record(self.shade.id, session_id='s')
+        
+        restarted = ViewBuffer(max_size=10, batch_size=10, flush_interval=60, spool_path=spool_path)
+        self.assertEqual(restarted.replay_spool(), 2)
+        self.assertEqual(restarted.flush(), 2)
+        self.assertEqual(ProductView.objects.count(), 2)
+        self.assertFalse(os.path.exists(restarted.process_spool_path) or os.path.exists(restarted.flushing_path))
+
+    def test_spool_files_are_per_process_and_claimed_once(self):
+        spool_path = os.path.join(tempfile.mkdtemp(), 'views.log')
+        dead_pid = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True).stdout.strip()
+        with open(f'{spool_path}.{dead_pid}.flushing', 'w') as spool:
+            spool.write(f'[{self.lamp.id}, null, "s", {time.time()}]\n[{self.shade.id}, null, "s", ')
+        # A live worker's spool holds events still in its memory
+        with open(f'{spool_path}.{os.getppid()}', 'w') as spool:
+            spool.write(f'[{self.lamp.id}, null, "t", {time.time()}]\n')
+        
+        first = ViewBuffer(max_size=10, batch_size=10, flush_interval=60, spool_path=spool_path)
+        self.assertEqual(first.replay_spool(), 1)
+        # Another worker starting next sees this process's claimed events as live
+        with mock.patch('os.getpid', return_value=int(dead_pid)):
+            self.assertEqual(ViewBuffer(max_size=10, batch_size=10, flush_interval=60, spool_path=spool_path).replay_spool(), 0)
+        self.assertEqual(first.flush(), 1)
+        self.assertEqual(os.listdir(os.path.dirname(spool_path)), [f'views.log.{os.getppid()}'])
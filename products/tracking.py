@@ -0,0 +1,345 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+
+from .models import Product, ProductCard, ProductView
+
+logger = logging.getLogger(__name__)
+
+
+class DedupeWindow:
+    """
+    Remembers which keys were seen in the last `window` seconds, in time buckets.
+
+    Keys go into the set of the current bucket (window / `buckets` seconds wide); a key counts
+    as seen while any live bucket holds it, and buckets older than the window are dropped
+    whole, so expiry needs no per-key timestamps. Keys are stored as hashes. Once more than
+    `max_keys` are held the oldest bucket is dropped early, which bounds memory at the cost
+    of letting some repeats through. State is per process.
+    """
+
+    def __init__(self, window, max_keys, buckets=6):
+        self.window = window
+        self.bucket_count = buckets
+        self.width = window / buckets if window > 0 else 0
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # bucket number -> set of key hashes, oldest first
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _drop_oldest(self):
+        self.size -= len(self.buckets.popitem(last=False)[1])
+
+    def seen(self, *keys):
+        """True when any of `keys` was seen within the window; otherwise remember them all and return False"""
+        if self.window <= 0:
+            return False
+        keys = {hash(key) for key in keys}
+        current = int(time.time() / self.width)
+        with self.lock:
+            while self.buckets and next(iter(self.buckets)) <= current - self.bucket_count:
+                self._drop_oldest()
+            if any(not keys.isdisjoint(bucket) for bucket in self.buckets.values()):
+                return True
+            while self.buckets and self.size + len(keys) > self.max_keys:
+                self._drop_oldest()
+            self.buckets.setdefault(current, set()).update(keys)
+            self.size += len(keys)
+            return False
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.size = 0
+
+
+class ViewBuffer:
+    """
+    In-process buffer of product view events, written in batches off the request path.
+
+    record() only appends to a bounded list; a background thread (started by the WSGI/ASGI
+    entry points) flushes it every `flush_interval` seconds or as soon as `batch_size` events
+    are waiting, with one bulk_create for the ProductView rows and one UPDATE per distinct
+    increment for the view counters. Without the thread, a full batch is flushed inline.
+    When the buffer holds `max_size` events new ones are dropped and counted.
+
+    With a `spool_path`, every event is also appended to a file of this process
+    (`<spool_path>.<pid>`), so events still in memory when the process dies are replayed by
+    the next process that starts. Each process only moves and deletes its own files, and
+    leftovers are claimed by renaming them, so concurrent workers never replay one twice.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval, spool_path='', dedupe=None):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.events = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+        # Process that called start(), and whether the exit and fork hooks are registered
+        self.pid = None
+        self.hooks_registered = False
+        self.table_ready = None
+        self.counters = Counter()
+        # Repeat views of a product by the same viewer within the window aren't recorded
+        self.dedupe = dedupe or DedupeWindow(0, 0)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            settings.PRODUCT_VIEW_BUFFER_SIZE,
+            settings.PRODUCT_VIEW_BATCH_SIZE,
+            settings.PRODUCT_VIEW_FLUSH_INTERVAL,
+            settings.PRODUCT_VIEW_SPOOL_PATH,
+            DedupeWindow(settings.PRODUCT_VIEW_DEDUPE_WINDOW, settings.PRODUCT_VIEW_DEDUPE_MAX_KEYS),
+        )
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def record(self, product_id, user_id=None, session_id=None, viewers=None):
+        """
+        Queue one view; returns False when it repeats a recent view or the buffer is full.
+        Repeats are matched on any of `viewers`, which defaults to the user or session id.
+        """
+        if self.pid is not None and self.pid != os.getpid():
+            # First view in a worker forked after start() (gunicorn --preload, uWSGI without
+            # lazy-apps): the parent's thread didn't survive the fork, so start this one's
+            self.start(replay=False)
+        if viewers is None:
+            viewers = [('user', user_id) if user_id is not None else ('session', session_id)]
+        event = [product_id, user_id, session_id, time.time()]
+        with self.lock:
+            if len(self.events) >= self.max_size:
+                self.counters['dropped'] += 1
+                return False
+            # Checked under the buffer lock, so a key is only marked seen once its view is queued
+            if self.dedupe.seen(*[(viewer, product_id) for viewer in viewers]):
+                self.counters['suppressed'] += 1
+                return False
+            self.events.append(event)
+            self.counters['recorded'] += 1
+            if self.spool_path:
+                with open(self.process_spool_path, 'a') as spool:
+                    spool.write(json.dumps(event) + '\n')
+            full = len(self.events) >= self.batch_size
+            if full and self.running:
+                self.counters['early_flushes'] += 1
+        if full:
+            if self.running:
+                # Don't wait for the interval with a full batch waiting
+                self.wakeup.set()
+            else:
+                self.flush()
+        return True
+
+    def flush(self):
+        """Write out the buffered events; returns how many were written"""
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, []
+                self._rotate_spool()
+            if not events:
+                return 0
+            try:
+                self._write(events)
+            except Exception as e:
+                logger.error(f"Writing {len(events)} product views failed: {e}")
+                with self.lock:
+                    # Retry with the next flush; the spooled copies stay in the .flushing file
+                    room = max(self.max_size - len(self.events), 0)
+                    self.counters['dropped'] += max(len(events) - room, 0)
+                    self.events[:0] = events[:room]
+                    self.counters['failed_flushes'] += 1
+                return 0
+            if self.spool_path and os.path.exists(self.flushing_path):
+                os.remove(self.flushing_path)
+            self.counters['flushed'] += len(events)
+            return len(events)
+
+    def _write(self, events):
+        if self.table_ready is None:
+            # Resolved once per process instead of on every view
+            self.table_ready = ProductView._meta.db_table in connection.introspection.table_names()
+
+        # Skip events whose product or user was deleted in the meantime
+        products = set(Product.objects.filter(pk__in={event[0] for event in events}).values_list('pk', flat=True))
+        user_ids = {event[1] for event in events if event[1] is not None}
+        users = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+        events = [event for event in events if event[0] in products and (event[1] is None or event[1] in users)]
+
+        increments = defaultdict(list)
+        for product_id, count in Counter(event[0] for event in events).items():
+            increments[count].append(product_id)
+
+        with transaction.atomic():
+            if self.table_ready:
+                ProductView.objects.bulk_create([
+                    ProductView(
+                        product_id=product_id,
+                        user_id=user_id,
+                        session_id=session_id,
+                        timestamp=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc),
+                    )
+                    for product_id, user_id, session_id, timestamp in events
+                ], batch_size=self.batch_size)
+            # Popularity counters used by ?sort=popularity, one UPDATE per distinct increment
+            for count, product_ids in increments.items():
+                Product.objects.filter(pk__in=product_ids).update(view_count=F('view_count') + count)
+                ProductCard.objects.filter(pk__in=product_ids).update(view_count=F('view_count') + count)
+
+    @property
+    def process_spool_path(self):
+        # Resolved on use, so workers forked after the buffer was created get their own file
+        return f'{self.spool_path}.{os.getpid()}'
+
+    @property
+    def flushing_path(self):
+        return f'{self.process_spool_path}.flushing'
+
+    def _rotate_spool(self):
+        """Move the spooled events being flushed aside, so new events start a fresh file"""
+        if not self.spool_path or not os.path.exists(self.process_spool_path):
+            return
+        if os.path.exists(self.flushing_path):
+            # A failed flush left its events there; keep them with the new ones
+            with open(self.process_spool_path) as spool, open(self.flushing_path, 'a') as flushing:
+                flushing.write(spool.read())
+            os.remove(self.process_spool_path)
+        else:
+            os.replace(self.process_spool_path, self.flushing_path)
+
+    def _leftover_spools(self):
+        """Spool files of processes that are gone (or of an earlier process with this pid)"""
+        prefix = f'{self.spool_path}.'
+        for path in sorted(glob.glob(f'{glob.escape(self.spool_path)}.*')):
+            owner = path[len(prefix):].split('.')[0]
+            if owner.isdigit() and (int(owner) == os.getpid() or not _process_alive(int(owner))):
+                yield path
+
+    def replay_spool(self):
+        """
+        Load the events spooled by earlier processes that weren't written. Call it before
+        recording: the claimed events move to this process's .flushing file until written.
+        """
+        if not self.spool_path:
+            return 0
+        # Claim every leftover first, so the .flushing file isn't read while being appended to.
+        # Only one of the processes replaying at the same time wins each rename.
+        claimed = []
+        for index, path in enumerate(self._leftover_spools()):
+            target = f'{self.process_spool_path}.replaying.{time.time_ns()}.{index}'
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        replayed = []
+        for path in claimed:
+            with open(path) as spool:
+                for line in spool:
+                    try:
+                        replayed.append(json.loads(line))
+                    except ValueError:
+                        # Blank, or the last write of a process killed mid-line
+                        continue
+        if replayed:
+            with open(self.flushing_path, 'a') as flushing:
+                flushing.writelines(json.dumps(event) + '\n' for event in replayed)
+        for path in claimed:
+            os.remove(path)
+        with self.lock:
+            self.events[:0] = replayed
+        self.counters['replayed'] += len(replayed)
+        return len(replayed)
+
+    def start(self, replay=True):
+        """Replay the spool and start the background flusher; safe to call more than once"""
+        with self.start_lock:
+            if self.running and self.pid == os.getpid():
+                return
+            if replay:
+                self.replay_spool()
+            self.pid = os.getpid()
+            self.stopping = False
+            self.thread = threading.Thread(target=self._run, name='product-view-buffer', daemon=True)
+            self.thread.start()
+            if not self.hooks_registered:
+                atexit.register(self.stop)
+                if hasattr(os, 'register_at_fork'):
+                    os.register_at_fork(after_in_child=self._after_fork)
+                self.hooks_registered = True
+
+    def _after_fork(self):
+        """
+        Reset the state copied into a forked child. The parent's flusher keeps writing the
+        events it holds, so the child drops its copies; its own flusher starts on record().
+        """
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.events = []
+        self.counters = Counter()
+        self.dedupe.lock = threading.Lock()
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Product view flush failed: {e}")
+
+    def stats(self):
+        with self.lock:
+            buffered = len(self.events)
+        return {
+            'buffered': buffered,
+            'running': self.running,
+            'dedupe_keys': self.dedupe.size,
+            **{name: self.counters[name] for name in ('recorded', 'suppressed', 'flushed', 'dropped', 'early_flushes', 'failed_flushes', 'replayed')},
+        }
+
+
+def _process_alive(pid):
+    if os.name != 'posix':
+        # os.kill() would terminate the process on Windows; leave other processes' files alone
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+view_buffer = ViewBuffer.from_settings()
@@ -19,6 +19,18 @@ urlpatterns = [
         'post': 'create'
     }), name='product-list'),
     
+    path('search/', ProductViewSet.as_view({
+        'get': 'search'
+    }), name='product-search'),
+    
+    path('cards/', ProductViewSet.as_view({
+        'get': 'cards'
+    }), name='product-cards'),
+    
+    path('autocomplete/', ProductViewSet.as_view({
+        'get': 'autocomplete'
+    }), name='product-autocomplete'),
+    
     path('<int:pk>/', ProductViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
@@ -32,6 +44,10 @@ urlpatterns = [
         'post': 'create'
     }), name='category-list'),
     
+    path('categories/tree/', CategoryViewSet.as_view({
+        'get': 'tree'
+    }), name='category-tree'),
+    
     path('categories/<int:pk>/', CategoryViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
@@ -49,12 +65,17 @@ urlpatterns = [
     }), name='category-products'),
     
     # Product custom actions
+    path('<int:pk>/reviews/', ProductViewSet.as_view({
+        'get': 'reviews'
+    }), name='product-reviews'),
+    
+    # Pass the action kwargs (permission/parser classes) like a router would
     path('<int:pk>/add-review/', ProductViewSet.as_view({
         'post': 'add_review'
-    }), name='product-add-review'),
+    }, **ProductViewSet.add_review.kwargs), name='product-add-review'),
     
     path('<int:pk>/upload-images/', ProductViewSet.as_view({
         'post': 'upload_images'
-    }), name='product-upload-images'),
+    }, **ProductViewSet.upload_images.kwargs), name='product-upload-images'),
 ]
 
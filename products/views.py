@@ -1,17 +1,33 @@
-import uuid
+from datetime import datetime
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, parser_classes
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from rest_framework.settings import api_settings
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from django.conf import settings
 from django.db import transaction, connection, ProgrammingError
+from django.db.models import Count, Q
 
-from .models import Product, ProductView, Review, ProductImage, Category
-from .serializers import ProductSerializer, ProductCreateUpdateSerializer, ReviewSerializer, ProductImageSerializer, CategorySerializer
+from .models import Product, ProductCard, Review, ProductImage, Category
+from .search import search_products
+from .tracking import view_buffer
+from .fast_serializers import fast_list_data
+from . import autocomplete as autocomplete_index
+from analytics.models import UserActivity
+from .serializers import ProductSerializer, ProductCardSerializer, ProductCreateUpdateSerializer, ReviewSerializer, ProductImageSerializer, CategorySerializer
 from permissions import IsSellerOrAdmin, IsProductSeller
+from middleware import get_visitor_id, get_visitor_keys
+from pagination import KeysetPagination, IdKeysetPagination
+from renderers import ColumnarJSONRenderer
+from conditional import make_etag, not_modified, page_etag, set_validators
+from caching import bump_table_versions, bump_version, cache_response
+
+# Cache namespaces a rendered product depends on
+PRODUCT_NAMESPACES = ('product', 'category', 'review', 'productimage')
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -21,21 +37,31 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = IdKeysetPagination
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsSellerOrAdmin()]
         return super().get_permissions()
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Categories change rarely; pages are served from the query cache until the table is written
+            queryset = queryset.cached()
+        return queryset
+    
     @extend_schema(
         description="List all categories",
         responses={200: CategorySerializer(many=True)}
     )
+    @cache_response('category')
     def list(self, request, *args, **kwargs):
         print("CategoryViewSet.list() called")  # Debug print
         print(f"Request path: {request.path}")  # Print the request path
         print(f"Request method: {request.method}")  # Print the request method
-        return super().list(request, *args, **kwargs)
+        etag = page_etag(self.paginator, self.get_queryset(), request, self, ('id', 'updated_at'))
+        return not_modified(request, etag) or set_validators(super().list(request, *args, **kwargs), etag)
     
     @extend_schema(
         description="Create a new category",
@@ -49,8 +75,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
         description="Retrieve a specific category by ID",
         responses={200: CategorySerializer}
     )
+    @cache_response('category')
     def retrieve(self, request, *args, **kwargs):
-        return super().retrieve(request, *args, **kwargs)
+        instance = self.get_object()
+        etag = make_etag(instance.pk, instance.updated_at)
+        return not_modified(request, etag, instance.updated_at) or set_validators(
+            Response(self.get_serializer(instance).data), etag, instance.updated_at
+        )
     
     @extend_schema(
         description="Update a category (full update)",
@@ -87,6 +118,11 @@ class CategoryViewSet(viewsets.ModelViewSet):
             with connection.cursor() as cursor:
                 cursor.execute("DELETE FROM products_category WHERE id = %s", [category_id])
             
+            # Raw SQL bypasses the signals that invalidate the caches and autocomplete entry
+            Category.invalidate_tree()
+            bump_version('category')
+            bump_table_versions(Category)
+            autocomplete_index.remove_item('category', category_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response(
@@ -94,40 +130,152 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @extend_schema(
+        description="Get the full category tree with product counts (served from cache)",
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    @action(detail=False, methods=['get'])
+    @cache_response('category', 'product')
+    def tree(self, request):
+        """
+        Get the full category tree. Each node carries its direct product count and
+        the product count of its whole subtree.
+        """
+        tree = Category.get_tree()
+        # The tree is already built and cached, so hash the data itself
+        etag = make_etag(tree, weak=False)
+        return not_modified(request, etag) or set_validators(Response(tree), etag)
+    
     @extend_schema(
         description="Get all subcategories for a specific category",
+        parameters=[
+            OpenApiParameter(
+                name='recursive',
+                description='Include all descendants, not only direct children',
+                required=False,
+                type=bool,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
         responses={200: CategorySerializer(many=True)}
     )
     @action(detail=True, methods=['get'])
+    @cache_response('category')
     def subcategories(self, request, pk=None):
         """
         Get all subcategories for a specific category
         """
         category = self.get_object()
-        subcategories = Category.objects.filter(parent=category)
-        serializer = self.get_serializer(subcategories, many=True)
-        return Response(serializer.data)
+        if request.query_params.get('recursive') == 'true':
+            subcategories = category.get_descendants()
+        else:
+            subcategories = Category.objects.filter(parent=category)
+        etag = page_etag(self.paginator, subcategories, request, self, ('id', 'updated_at'))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        page = self.paginate_queryset(subcategories)
+        serializer = self.get_serializer(page, many=True)
+        return set_validators(self.get_paginated_response(serializer.data), etag)
     
     @extend_schema(
         description="Get all products in a specific category",
+        parameters=[
+            OpenApiParameter(
+                name='include_descendants',
+                description='Also include products of all subcategories',
+                required=False,
+                type=bool,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
         responses={200: ProductSerializer(many=True)}
     )
     @action(detail=True, methods=['get'])
+    @cache_response(*PRODUCT_NAMESPACES)
     def products(self, request, pk=None):
         """
-        Get all products in a specific category
+        Get all products in a specific category.
+        Query budget: the category lookup plus the product list budget.
         """
         category = self.get_object()
-        products = category.products.all()
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data)
+        if request.query_params.get('include_descendants') == 'true':
+            # One query over the whole subtree through the materialized path
+            products = Product.objects.filter(category__path__startswith=category.path)
+        else:
+            products = Product.objects.filter(category=category)
+        products = products.with_related(ProductSerializer.get_selected_fields(request))
+        
+        # Products are paginated on (created_at, id) rather than the category ordering
+        paginator = KeysetPagination()
+        etag = page_etag(paginator, products, request, self, ProductViewSet.VALIDATOR_FIELDS)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        page = paginator.paginate_queryset(products.prefetch_related(None), request, view=self)
+        fragments = ProductSerializer.load_fragments(page, request)
+        serializer = ProductSerializer(page, many=True, context={'request': request, 'product_fragments': fragments})
+        data = serializer.data
+        fragments.save()
+        return set_validators(paginator.get_paginated_response(data), etag)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
+    """
+    Product API.
+
+    Query budget for read endpoints (independent of the number of products):
+    - list: at most 3 queries (page ETag, products with seller/category, images), plus one
+      for the category path when filtering by category and two for ?facets=true
+    - retrieve: at most 3 queries (validators, product, images); a 304 costs only the validator
+      query. Views are buffered and written in batches (see products/tracking.py)
+    List and retrieve answer If-None-Match / If-Modified-Since with 304 Not Modified.
+    - cards: 1 query on the ProductCard table, plus one for the category path when filtering by category
+    - reviews: 2 queries (product lookup, one page of reviews with their users)
+    - search: 3 queries (ranked ids, products, images), plus the search activity write
+    - autocomplete: no queries once the in-memory index is built
+    Supports ?fields= and ?expand= (images); relations that aren't rendered aren't fetched.
+    """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsProductSeller]
     parser_classes = [JSONParser, MultiPartParser, FormParser]
+    # ?format=columnar for bulk consumers of the list endpoints
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
+    
+    # Keyset orderings for ?sort= on the list endpoint, each backed by a product index
+    SORT_ORDERINGS = {
+        'newest': ('-created_at', '-id'),
+        'price': ('effective_price', 'id'),
+        '-price': ('-effective_price', '-id'),
+        'rating': ('-rating_average', '-id'),
+        'popularity': ('-view_count', '-id'),
+    }
+    
+    # The same sort orders on the ProductCard indexes, whose primary key is `product`
+    CARD_ORDERINGS = {
+        'newest': ('-created_at', '-product'),
+        'price': ('effective_price', 'product'),
+        '-price': ('-effective_price', '-product'),
+        'rating': ('-rating_average', '-product'),
+        'popularity': ('-view_count', '-product'),
+    }
+    
+    # What a rendered product depends on, besides the columns covered by updated_at
+    # (review and image changes bump Product.updated_at too); used for ETags.
+    # A seller rename doesn't touch their products, so the username is included as is.
+    VALIDATOR_FIELDS = ('id', 'updated_at', 'category__updated_at', 'seller__username')
+    
+    # Upper bounds of the price facet buckets; the last bucket is open-ended
+    PRICE_FACET_EDGES = [25, 50, 100, 250, 500]
+    
+    # Keyset orderings for the reviews action, all served by the (product, created_at, id) index
+    REVIEW_ORDERINGS = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+    }
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -145,42 +293,197 @@ class ProductViewSet(viewsets.ModelViewSet):
         user = self.request.user
         # Admins and staff can see all products
         if user.is_authenticated and (user.is_staff or user.role == 'admin'):
-            return Product.objects.all()
+            queryset = Product.objects.all()
         # Sellers can see their own products
         elif user.is_authenticated and user.role == 'seller':
-            return Product.objects.filter(seller=user)
+            queryset = Product.objects.filter(seller=user)
         # Everyone else can see all products (for browsing)
-        return Product.objects.all()
+        else:
+            queryset = Product.objects.all()
+        
+        # Only the read paths render ProductSerializer
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.with_related(ProductSerializer.get_selected_fields(self.request))
+        return queryset
+    
+    @extend_schema(
+        description="List products with optional filters, sorting and facet counts",
+        parameters=[
+            OpenApiParameter(name='category', description='Category id; includes its subcategories', required=False, type=int, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='min_price', description='Minimum effective price (discount price when set)', required=False, type=float, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='max_price', description='Maximum effective price (discount price when set)', required=False, type=float, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='in_stock', description='Only products with stock', required=False, type=bool, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='seller', description='Seller id', required=False, type=int, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='min_rating', description='Minimum average rating', required=False, type=float, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='sort', description='newest (default), price, -price, rating or popularity', required=False, type=str, location=OpenApiParameter.QUERY),
+            OpenApiParameter(name='facets', description='Include category, price and rating facet counts', required=False, type=bool, location=OpenApiParameter.QUERY),
+        ],
+    )
+    @cache_response(*PRODUCT_NAMESPACES)
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = self._filter_catalog(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        sort = request.query_params.get('sort', 'newest')
+        if sort not in self.SORT_ORDERINGS:
+            return Response(
+                {'error': f"sort must be one of: {', '.join(self.SORT_ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        self.paginator.ordering = self.SORT_ORDERINGS[sort]
+        
+        # Facets cover the whole filtered catalog, not just the page, so they aren't validated
+        etag = None
+        if request.query_params.get('facets') != 'true':
+            etag = page_etag(self.paginator, queryset, request, self, self.VALIDATOR_FIELDS)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+        
+        data = fast_list_data(self, queryset)
+        if data is None:
+            # Serialize only the products missing from the fragment cache, and load images for those only
+            page = self.paginate_queryset(queryset.prefetch_related(None))
+            fragments = ProductSerializer.load_fragments(page, request)
+            context = {**self.get_serializer_context(), 'product_fragments': fragments}
+            data = self.get_serializer(page, many=True, context=context).data
+            fragments.save()
+        response = self.get_paginated_response(data)
+        if request.query_params.get('facets') == 'true':
+            response.data['facets'] = self._facet_counts(queryset)
+        return set_validators(response, etag)
+    
+    def _filter_catalog(self, queryset, params, card=False):
+        """
+        Apply the catalog filters from the query string; raises ValueError on bad input.
+        With card=True the queryset is over ProductCard, which has the filtered columns inline.
+        """
+        def number(name, cast=float):
+            try:
+                return cast(params[name])
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+        
+        if not card:
+            queryset = queryset.with_effective_price()
+        if 'category' in params:
+            path = Category.objects.filter(pk=number('category', int)).values_list('path', flat=True).first()
+            if path is None:
+                return queryset.none()
+            queryset = queryset.filter(**{'category_path__startswith' if card else 'category__path__startswith': path})
+        if 'min_price' in params:
+            queryset = queryset.filter(effective_price__gte=number('min_price'))
+        if 'max_price' in params:
+            queryset = queryset.filter(effective_price__lte=number('max_price'))
+        if params.get('in_stock') == 'true':
+            queryset = queryset.filter(in_stock=True) if card else queryset.filter(stock__gt=0)
+        if 'seller' in params:
+            queryset = queryset.filter(seller_id=number('seller', int))
+        if 'min_rating' in params:
+            queryset = queryset.filter(rating_average__gte=number('min_rating'))
+        return queryset
     
+    @extend_schema(
+        description="Lightweight product cards for catalog pages, read from the denormalized ProductCard table; "
+                    "takes the same filters and sort orders as the product list",
+        responses={200: ProductCardSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    @cache_response(*PRODUCT_NAMESPACES)
+    def cards(self, request):
+        queryset = ProductCard.objects.all()
+        user = request.user
+        # Same visibility as get_queryset(): sellers only see their own products
+        if user.is_authenticated and not user.is_staff and user.role == 'seller':
+            queryset = queryset.filter(seller=user)
+        try:
+            queryset = self._filter_catalog(queryset, request.query_params, card=True)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        sort = request.query_params.get('sort', 'newest')
+        if sort not in self.CARD_ORDERINGS:
+            return Response(
+                {'error': f"sort must be one of: {', '.join(self.CARD_ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        self.paginator.ordering = self.CARD_ORDERINGS[sort]
+        page = self.paginate_queryset(queryset)
+        serializer = ProductCardSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+    
+    def _facet_counts(self, queryset):
+        """Category, price bucket and rating bucket counts for the filtered products, in two queries"""
+        queryset = queryset.order_by().prefetch_related(None)
+        
+        categories = queryset.values('category_id', 'category__name').annotate(count=Count('id')).order_by('-count')
+        
+        edges = [0] + self.PRICE_FACET_EDGES + [None]
+        price_buckets = list(zip(edges[:-1], edges[1:]))
+        aggregates = {}
+        for index, (low, high) in enumerate(price_buckets):
+            condition = Q(effective_price__gte=low)
+            if high is not None:
+                condition &= Q(effective_price__lt=high)
+            aggregates[f'price_{index}'] = Count('id', filter=condition)
+        for rating in range(4, 0, -1):
+            aggregates[f'rating_{rating}'] = Count('id', filter=Q(rating_average__gte=rating))
+        counts = queryset.aggregate(**aggregates)
+        
+        return {
+            'categories': [
+                {'id': row['category_id'], 'name': row['category__name'], 'count': row['count']}
+                for row in categories
+            ],
+            'price': [
+                {'min': low, 'max': high, 'count': counts[f'price_{index}']}
+                for index, (low, high) in enumerate(price_buckets)
+            ],
+            'rating': [
+                {'min_rating': rating, 'count': counts[f'rating_{rating}']}
+                for rating in range(4, 0, -1)
+            ],
+        }
+    
+    # A cached response skips the handler, so record the view separately
+    @cache_response(*PRODUCT_NAMESPACES, on_hit=lambda view, request, *args, **kwargs: view._track_view(kwargs['pk']))
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        # Validate the client's copy from one narrow query before loading the product and its images.
+        # It goes through get_queryset(), so products the caller can't see are never a 304.
+        try:
+            validators = self.get_queryset().prefetch_related(None).filter(pk=kwargs['pk']).values_list(*self.VALIDATOR_FIELDS[1:]).first()
+        except (ValueError, TypeError):
+            validators = None
+        if validators is not None:
+            last_modified = max(value for value in validators if isinstance(value, datetime))
+            etag = make_etag(kwargs['pk'], *validators)
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                self._track_view(kwargs['pk'])
+                return response
         
-        # Track view - safely handle session
+        instance = self.get_object()
+        self._track_view(instance.pk)
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return set_validators(response, etag, last_modified) if validators is not None else response
+    
+    def _track_view(self, product_id):
+        request = self.request
+        # Requests made by the cache warm-up (products/warmup.py) aren't visits
+        if getattr(request, 'cache_warmup', False):
+            return
+        # Track view; anonymous visitors are identified by their visitor cookie, not a session
         try:
             if request.user.is_authenticated:
-                # Check if ProductView table exists before creating a record
-                if self._table_exists('products_productview'):
-                    ProductView.objects.create(product=instance, user=request.user)
+                view_buffer.record(product_id, user_id=request.user.pk)
             else:
-                session_id = request.session.get('session_id')
-                if not session_id:
-                    session_id = str(uuid.uuid4())
-                    request.session['session_id'] = session_id
-                # Check if ProductView table exists before creating a record
-                if self._table_exists('products_productview'):
-                    ProductView.objects.create(product=instance, session_id=session_id)
+                view_buffer.record(product_id, session_id=get_visitor_id(request), viewers=get_visitor_keys(request))
         except Exception:
             # Don't let view tracking failure affect the API response
             pass
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
-    
-    def _table_exists(self, table_name):
-        """Check if a table exists in the database"""
-        with connection.cursor() as cursor:
-            tables = connection.introspection.table_names()
-            return table_name in tables
     
     def _safe_delete_related(self, model_class, filter_kwargs):
         """Safely delete related objects, handling the case where the table doesn't exist"""
@@ -190,6 +493,13 @@ class ProductViewSet(viewsets.ModelViewSet):
             # Table doesn't exist, so nothing to delete
             pass
     
+    def _limit(self, request, default, maximum):
+        """The ?limit= parameter capped at `maximum`; raises ValueError unless it is a positive integer"""
+        limit = int(request.query_params.get('limit', default))
+        if limit < 1:
+            raise ValueError(limit)
+        return min(limit, maximum)
+    
     @extend_schema(
         request={
             'multipart/form-data': {
@@ -368,13 +678,24 @@ class ProductViewSet(viewsets.ModelViewSet):
             except Exception:
                 # Ignore errors if table doesn't exist
                 pass
+            
+            # Delete the search document and listing card
+            cursor.execute("DELETE FROM products_productsearchdocument WHERE product_id = %s", [product_id])
+            cursor.execute("DELETE FROM products_productcard WHERE product_id = %s", [product_id])
                 
             # Finally delete the product itself
             cursor.execute("DELETE FROM products_product WHERE id = %s", [product_id])
         
+        # Raw SQL bypasses the signals that invalidate the caches and autocomplete entry
+        Category.invalidate_tree()
+        bump_version('product', 'productimage', 'review')
+        bump_table_versions(Product)
+        autocomplete_index.remove_item('product', product_id)
+        
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def add_review(self, request, pk=None):
         product = self.get_object()
         serializer = ReviewSerializer(data=request.data)
@@ -393,6 +714,141 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @extend_schema(
+        description="Full-text product search over names, descriptions and category names, best matches first",
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                description='Search text',
+                required=True,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='limit',
+                description='Maximum number of results',
+                required=False,
+                type=int,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
+        responses={200: ProductSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'The q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = self._limit(request, settings.REST_FRAMEWORK['PAGE_SIZE'], settings.API_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        product_ids = search_products(self.get_queryset(), query, limit)
+        products = self.get_queryset().filter(id__in=product_ids).with_related(
+            ProductSerializer.get_selected_fields(request)
+        )
+        position = {product_id: index for index, product_id in enumerate(product_ids)}
+        ranked = sorted(products, key=lambda product: position[product.id])
+        
+        UserActivity.objects.create(
+            user=request.user if request.user.is_authenticated else None,
+            session_id=None if request.user.is_authenticated else get_visitor_id(request),
+            activity_type='search',
+            search_query=query[:255],
+        )
+        
+        serializer = ProductSerializer(ranked, many=True, context={'request': request})
+        return Response({'query': query, 'results': serializer.data})
+    
+    @extend_schema(
+        description="Product and category name suggestions for a typed prefix, most popular first",
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                description='Typed prefix',
+                required=True,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='limit',
+                description='Maximum number of suggestions (default 10, max 20)',
+                required=False,
+                type=int,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = self._limit(request, 10, 20)
+        except ValueError:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        suggestions = autocomplete_index.get_index().lookup(query, limit)
+        return Response({'query': query, 'suggestions': suggestions})
+    
+    @extend_schema(
+        description="List the reviews of a product, cursor-paginated",
+        parameters=[
+            OpenApiParameter(
+                name='rating',
+                description='Only reviews with this rating (1-5)',
+                required=False,
+                type=int,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='min_rating',
+                description='Only reviews with at least this rating (1-5)',
+                required=False,
+                type=int,
+                location=OpenApiParameter.QUERY
+            ),
+            OpenApiParameter(
+                name='ordering',
+                description='newest (default) or oldest',
+                required=False,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
+        ],
+        responses={200: ReviewSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
+        product = self.get_object()
+        reviews = Review.objects.filter(product=product).select_related('user')
+        
+        for param, lookup in [('rating', 'rating'), ('min_rating', 'rating__gte')]:
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                reviews = reviews.filter(**{lookup: int(value)})
+            except ValueError:
+                return Response(
+                    {'error': f'{param} must be a number between 1 and 5'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        ordering = request.query_params.get('ordering', 'newest')
+        if ordering not in self.REVIEW_ORDERINGS:
+            return Response(
+                {'error': f"ordering must be one of: {', '.join(self.REVIEW_ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        paginator = KeysetPagination()
+        paginator.ordering = self.REVIEW_ORDERINGS[ordering]
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = ReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
     @extend_schema(
         request={
             'multipart/form-data': {
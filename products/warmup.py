@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+from core.schema import build_schema
+from .models import Category, ProductView
+
+logger = logging.getLogger(__name__)
+
+
+def fetch(path, params=None, host=None, accept='application/json'):
+    """
+    Render an anonymous GET through the URLconf, which fills the response, fragment and
+    query caches the same way a visitor would. Warm-up requests don't count as product views.
+    """
+    request = RequestFactory().get(path, params or {}, HTTP_HOST=host or settings.WARM_CACHES_HOST, HTTP_ACCEPT=accept)
+    request.cache_warmup = True
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise ValueError(f'GET {path} returned {response.status_code}')
+    return response
+
+
+def most_viewed_products(limit, days):
+    since = timezone.now() - timedelta(days=days)
+    return list(
+        ProductView.objects.filter(timestamp__gte=since).order_by()
+        .values('product_id').annotate(views=Count('id')).order_by('-views')
+        .values_list('product_id', flat=True)[:limit]
+    )
+
+
+def warm_targets(top_products=None, view_days=None, host=None, accept='application/json'):
+    """(key, callable) pairs for everything the warm-up precomputes"""
+    get = partial(fetch, host=host, accept=accept)
+    targets = [
+        ('category-tree', Category.get_tree),
+        ('schema', build_schema),
+    ]
+    top_products = settings.WARM_CACHES_TOP_PRODUCTS if top_products is None else top_products
+    view_days = settings.WARM_CACHES_VIEW_DAYS if view_days is None else view_days
+    for product_id in most_viewed_products(top_products, view_days):
+        targets.append((f'product:{product_id}', partial(get, f'/api/products/{product_id}/')))
+    # First page of each top-level category, subcategories included
+    for category_id in Category.objects.filter(parent__isnull=True).order_by('id').values_list('id', flat=True):
+        targets.append((f'category:{category_id}', partial(get, '/api/products/', {'category': category_id})))
+    return targets
+
+
+def _timed(key, func):
+    start = time.perf_counter()
+    error = None
+    try:
+        func()
+    except Exception as e:
+        error = e
+    finally:
+        # Each pool thread opens its own connection
+        connections.close_all()
+    return key, time.perf_counter() - start, error
+
+
+def warm_caches(targets=None, workers=None, on_result=None):
+    """
+    Compute the warm-up targets on a thread pool. Returns (key, seconds, error) per target,
+    in completion order; `on_result` is called with each as it finishes.
+    """
+    targets = warm_targets() if targets is None else targets
+    results = []
+    with ThreadPoolExecutor(max_workers=workers or settings.WARM_CACHES_WORKERS) as pool:
+        futures = [pool.submit(_timed, key, func) for key, func in targets]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(*result)
+    return results
+
+
+def _log_result(key, seconds, error):
+    if error is not None:
+        logger.warning(f"Cache warm-up of {key} failed: {error}")
+    else:
+        logger.info(f"Warmed {key} in {seconds * 1000:.1f} ms")
+
+
+def start_background_warmup():
+    """Warm the caches on a daemon thread; used by the WSGI/ASGI entry points after startup"""
+    def run():
+        try:
+            warm_caches(on_result=_log_result)
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+        finally:
+            connections.close_all()
+    
+    thread = threading.Thread(target=run, name='cache-warmup', daemon=True)
+    thread.start()
+    return thread
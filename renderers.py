@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that can also encode an iterable of items as a JSON array one item at
+    a time, so the whole document never has to be held in memory.
+    """
+    
+    def render_stream(self, items, renderer_context=None):
+        yield b'['
+        for index, item in enumerate(items):
+            if index:
+                yield b','
+            yield self.render(item, renderer_context=renderer_context)
+        yield b']'
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Compact rendering of lists for bulk consumers, selected with ?format=columnar or
+    `Accept: application/vnd.columnar+json`. A list (or a paginated page's results) becomes
+    {"columns": [...], "dictionaries": {...}, "rows": [[...], ...]}: key names are sent once,
+    and string columns that mostly repeat (category and seller names, statuses) are sent as
+    indexes into a per-column list of their distinct values. Other payloads render as JSON.
+    """
+    media_type = 'application/vnd.columnar+json'
+    format = 'columnar'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            data = self.encode(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = {**{key: value for key, value in data.items() if key != 'results'}, **self.encode(data['results'])}
+        return super().render(data, accepted_media_type, renderer_context)
+    
+    @staticmethod
+    def encode(items):
+        columns = list(dict.fromkeys(key for item in items for key in item))
+        rows = [[item.get(column) for column in columns] for item in items]
+        dictionaries = {}
+        for index, column in enumerate(columns):
+            values = [row[index] for row in rows if row[index] is not None]
+            if not values or not all(isinstance(value, str) for value in values):
+                continue
+            distinct = list(dict.fromkeys(values))
+            # Only worth it when values repeat at least twice on average
+            if len(distinct) * 2 > len(values):
+                continue
+            positions = {value: position for position, value in enumerate(distinct)}
+            for row in rows:
+                if row[index] is not None:
+                    row[index] = positions[row[index]]
+            dictionaries[column] = distinct
+        return {'columns': columns, 'dictionaries': dictionaries, 'rows': rows}
+
+
+class StreamingListMixin:
+    """
+    Opt-in unpaginated export for list actions: with ?stream=true the whole queryset is
+    read with iterator(chunk_size=...), serialized one chunk at a time and sent as a JSON
+    array through a StreamingHttpResponse, so memory stays flat however many rows match.
+    Prefetches still apply, once per chunk.
+    """
+    stream_chunk_size = None
+    
+    def stream_list(self, queryset):
+        """The streamed response when the request asks for one, otherwise None"""
+        if self.request.query_params.get('stream') != 'true':
+            return None
+        chunk_size = self.stream_chunk_size or settings.STREAM_CHUNK_SIZE
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        
+        def items():
+            chunk = []
+            for obj in queryset.iterator(chunk_size=chunk_size):
+                chunk.append(obj)
+                if len(chunk) >= chunk_size:
+                    yield from self.get_serializer(chunk, many=True).data
+                    chunk = []
+            if chunk:
+                yield from self.get_serializer(chunk, many=True).data
+        
+        renderer = StreamingJSONRenderer()
+        return StreamingHttpResponse(renderer.render_stream(items()), content_type=renderer.media_type)
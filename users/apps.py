@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from caching import track_table_versions
+        from .models import CustomUser
+        
+        # Every authenticated request looks its user up through the query cache
+        track_table_versions(CustomUser)
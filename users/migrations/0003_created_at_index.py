@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_alter_customuser_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['created_at', 'id'], name='user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.15 on 2026-10-17 05:00
+
+import users.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from caching import CachedQuerySet
+
+class CustomUserManager(UserManager.from_queryset(CachedQuerySet)):
+    pass
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = (
@@ -10,10 +14,16 @@ class CustomUser(AbstractUser):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='customer')
     address = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = CustomUserManager()
 
     def __str__(self):
         return self.username
 
     class Meta:
         verbose_name = 'User'
-        verbose_name_plural = 'Users'
\ No newline at end of file
+        verbose_name_plural = 'Users'
+        indexes = [
+            # Backs keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='user_created_idx'),
+        ]
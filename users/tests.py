@@ -1,7 +1,14 @@
+import json
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from authentication import CachedJWTAuthentication
+from core.schema import build_schema
 
 User = get_user_model()
 
@@ -24,3 +31,37 @@ class UserTests(TestCase):
         self.assertEqual(User.objects.count(), 2)
         self.assertEqual(User.objects.get(username='testuser').role, 'customer')
 
+    def test_stream_user_list(self):
+        User.objects.create_user('customer', 'customer@test.com', 'password123')
+        response = self.client.get('/api/users/', {'stream': 'true'})
+        self.assertTrue(response.streaming)
+        users = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([user['username'] for user in users], ['admin', 'customer'])
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@test.com', 'password123')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_user_lookup_is_cached_until_the_user_changes(self):
+        self.client.get('/api/cart/my_cart/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/cart/my_cart/')
+        self.assertFalse([query for query in queries if 'users_customuser' in query['sql']])
+        
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/cart/my_cart/').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_only_authentication_columns_are_cached(self):
+        user = CachedJWTAuthentication().get_user(RefreshToken.for_user(self.user).access_token)
+        self.assertTrue({'password', 'email', 'address'} <= user.get_deferred_fields())
+        self.assertEqual(user.role, 'customer')
+        self.assertEqual(self.client.get('/api/users/me/').data['email'], 'buyer@test.com')
+    
+    def test_schema_documents_the_cached_authentication(self):
+        operation = build_schema()['paths']['/api/cart/my_cart/']['get']
+        self.assertIn({'jwtAuth': []}, operation['security'])
@@ -9,6 +9,7 @@ from django.db import transaction
 from .models import CustomUser
 from .serializers import CustomUserSerializer, LoginSerializer
 from permissions import IsAdmin
+from renderers import StreamingListMixin
 
 @extend_schema(
     request=LoginSerializer,
@@ -64,7 +65,7 @@ def user_login(request):
         'user': CustomUserSerializer(user).data
     })
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     
@@ -89,6 +90,14 @@ class UserViewSet(viewsets.ModelViewSet):
         # Regular users can only see themselves
         return CustomUser.objects.filter(id=user.id)
     
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='stream', description='Return every user as one streamed, unpaginated JSON array', required=False, type=bool, location=OpenApiParameter.QUERY),
+        ],
+    )
+    def list(self, request, *args, **kwargs):
+        return self.stream_list(self.filter_queryset(self.get_queryset())) or super().list(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         password = serializer.validated_data.pop('password', None)
         instance = serializer.save()
@@ -106,6 +115,7 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         """Get the current user's profile"""
-        serializer = self.get_serializer(request.user)
+        # request.user only has the authentication columns loaded
+        serializer = self.get_serializer(CustomUser.objects.get(pk=request.user.pk))
         return Response(serializer.data)
 